@@ -0,0 +1,435 @@
+# ============================================================================ #
+#
+#   Module of throughput benchmarks for the core module
+#   Run with: python -m pvnrt.bench
+#
+# ============================================================================ #
+
+
+
+# ============================================================================ #
+#    IMPORTS
+# ============================================================================ #
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+import numpy as np
+from PIL import Image
+import pvnrt as pv
+
+# peak RSS comes from /proc on Linux, from psutil (if installed) on Windows and from resource on macOS
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+
+# ============================================================================ #
+#    CONSTANTS
+# ============================================================================ #
+
+# settings of the synthetic data, can be changed with run_benchmarks(dataParams={...}) or on the command line
+DEFAULT_DATA_PARAMS = {
+    'treeDepth': 3,         # levels of sub folders in the file tree
+    'treeBreadth': 4,       # sub folders per folder
+    'filesPerDir': 25,      # files per folder
+    'fileSizeKB': 4,        # size of each file in the tree
+    'treeExts': ['txt', 'jpg', 'csv', 'png'],  # file extensions in the tree, used in turn
+    'imageCount': 100,      # number of images
+    'imageWidth': 1920,
+    'imageHeight': 1080,
+    'imageFormat': 'JPEG',  # any format Pillow can save
+    'imageDirs': 4,         # number of folders the images are spread over
+    'resizeWidth': 224,
+    'resizeHeight': 224,
+}
+
+# the data params each data set is built from, a kept data folder is rebuilt when any of them changes
+_DATA_SET_PARAMS = {
+    'tree': ['treeDepth', 'treeBreadth', 'filesPerDir', 'fileSizeKB', 'treeExts'],
+    'images': ['imageCount', 'imageWidth', 'imageHeight', 'imageFormat', 'imageDirs'],
+}
+
+# progress bar settings for the image functions (the bars go to the subprocess' stderr, which is discarded)
+_NO_BAR = (80, None, None)
+
+# each case takes the data folder and the data params, and returns the number of files and bytes it processed
+# (the function is called `repeat` times on the same data, only the call itself is timed)
+def _tree_files(dataDir:Path) -> tuple:
+    files = [Path(root, name) for root, _, names in os.walk(Path(dataDir, 'tree')) for name in names]
+    return files, sum(os.path.getsize(item) for item in files)
+
+def _image_files(dataDir:Path) -> tuple:
+    files = sorted(Path(dataDir, 'images').rglob('*.*'))
+    return files, sum(os.path.getsize(item) for item in files)
+
+def _resize_case(**kwargs):
+    def case(dataDir, params, files):
+        out = Path(dataDir, 'out')
+        shutil.rmtree(out, ignore_errors=True)
+        # the source paths are absolute, so everything up to the images folder is discarded to keep the output inside out
+        pv.core.image_resize([str(item) for item in files], params['resizeWidth'], params['resizeHeight'],
+            dstPath=str(out), discardSrcLevels=len(Path(dataDir, 'images').parts), returnOnly=False, returnPaths=True, progressBar=_NO_BAR, **kwargs)
+    return case
+
+CASES = {
+    # name: (data set ('tree' or 'images'), function(dataDir, params, files))
+    'filetype_search': ('tree', lambda dataDir, params, files: pv.core.filetype_search(str(Path(dataDir, 'tree')), params['treeExts'][:2])),
+    'filetype_search_table': ('tree', lambda dataDir, params, files: pv.core.filetype_search(str(Path(dataDir, 'tree')), params['treeExts'][:2], asTable=True)),
+    'iter_filetype_search': ('tree', lambda dataDir, params, files: sum(1 for _ in pv.core.iter_filetype_search(str(Path(dataDir, 'tree')), params['treeExts'][:2]))),
+    'discover_files': ('tree', lambda dataDir, params, files: pv.core.discover_files([str(Path(dataDir, 'tree'))], params['treeExts'])),
+    'get_tree_size_df': ('tree', lambda dataDir, params, files: pv.core.get_tree_size_df(str(Path(dataDir, 'tree')), progressBar=None)),
+    'get_tree_size_df_async': ('tree', lambda dataDir, params, files: pv.core.get_tree_size_df(str(Path(dataDir, 'tree')), progressBar=None, useAsync=True)),
+    'image_resize': ('images', _resize_case()),
+    'image_resize_full_decode': ('images', _resize_case(reduceOnLoad=False)),
+    'image_resize_workers': ('images', _resize_case(workers=os.cpu_count() or 1)),
+    'image_resize_to_array': ('images', lambda dataDir, params, files: pv.core.image_resize_to_array(files, params['resizeWidth'], params['resizeHeight'], progressBar=_NO_BAR)),
+}
+
+
+
+# ============================================================================ #
+#    SYNTHETIC DATA
+# ============================================================================ #
+
+def make_tree(rootDir, depth:int=3, breadth:int=4, filesPerDir:int=25, fileSizeKB:float=4, exts=('txt', 'jpg', 'csv', 'png')) -> int:
+    """
+    Creates a synthetic folder tree under rootDir, `depth` levels deep with `breadth` sub folders per folder and `filesPerDir` files of fileSizeKB each in every folder. The file extensions are used in turn. Returns the number of files created.
+    """
+    content = b'\0' * int(fileSizeKB * 1024)
+    count = 0
+    dirs = [Path(rootDir)]
+    for level in range(depth + 1):
+        next_dirs = []
+        for folder in dirs:
+            os.makedirs(folder, exist_ok=True)
+            for i in range(filesPerDir):
+                with open(Path(folder, 'file_' + str(i) + '.' + exts[i % len(exts)]), 'wb') as fyle:
+                    fyle.write(content)
+                count += 1
+            if level < depth:
+                next_dirs += [Path(folder, 'dir_' + str(j)) for j in range(breadth)]
+        dirs = next_dirs
+    return count
+
+def make_images(rootDir, count:int=100, width:int=1920, height:int=1080, imageFormat:str='JPEG', dirs:int=4, seed:int=0) -> int:
+    """
+    Creates `count` synthetic RGB images of width x height (a random gradient plus noise, so they compress like photos rather than like flat colour) spread over `dirs` sub folders of rootDir, saved in imageFormat. Returns the number of images created.
+    """
+    rng = np.random.default_rng(seed)
+    ext = {'JPEG': 'jpg'}.get(imageFormat.upper(), imageFormat.lower())
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    for i in range(count):
+        folder = Path(rootDir, 'class_' + str(i % max(1, dirs)))
+        os.makedirs(folder, exist_ok=True)
+        colours = rng.random((3, 3), dtype=np.float32) * 255
+        pixels = colours[0] * x + colours[1] * y + colours[2] * (1 - x) * (1 - y)
+        pixels += rng.normal(0, 8, size=(height, width, 1)).astype(np.float32)
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(Path(folder, 'image_' + str(i) + '.' + ext), imageFormat)
+    return count
+
+
+
+# ============================================================================ #
+#    MEASUREMENT
+# ============================================================================ #
+
+def _rss_mb() -> float:
+    """
+    Current resident memory of this process in MB, or None if it can't be read.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024**2
+    try:
+        with open('/proc/self/statm') as fyle:
+            return int(fyle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _peak_rss_mb() -> float:
+    """
+    Peak resident memory of this process in MB, or None if it can't be read.
+    """
+    # on Linux, VmHWM belongs to this process' own memory (ru_maxrss would carry over the peak of the parent that started it)
+    try:
+        with open('/proc/self/status') as fyle:
+            for line in fyle:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if psutil is not None and hasattr(psutil.Process().memory_info(), 'peak_wset'):
+        return psutil.Process().memory_info().peak_wset / 1024**2
+    if resource is not None:
+        # bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**2
+    return None
+
+def _run_case_here(case:str, dataDir, params:dict, repeat:int) -> dict:
+    """
+    Runs one case `repeat` times in this process and returns its measurements. Called in a fresh subprocess by run_benchmarks, so that the peak RSS belongs to this case alone.
+    """
+    data_set, function = CASES[case]
+    files, total_bytes = _tree_files(dataDir) if data_set == 'tree' else _image_files(dataDir)
+    rss_before = _rss_mb()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(Path(dataDir), params, files)
+        seconds.append(time.perf_counter() - start)
+    best = min(seconds)
+    return {
+        'case': case,
+        'files': len(files),
+        'mb': total_bytes / 1024**2,
+        'seconds_best': best,
+        'seconds_median': float(np.median(seconds)),
+        'files_per_s': len(files) / best if best else None,
+        # the tree cases only look at names and sizes, so bytes per second means nothing for them
+        'mb_per_s': total_bytes / 1024**2 / best if best and data_set == 'images' else None,
+        'rss_before_mb': rss_before,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+def _run_case_subprocess(case:str, dataDir, params:dict, repeat:int) -> dict:
+    """
+    Runs one case in a new Python process (with the same import paths as this one) and returns its measurements, or a dict with an 'error' if it failed.
+    """
+    result_file = Path(dataDir, 'result_' + case + '.json')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(item for item in sys.path if item))
+    command = [sys.executable, '-m', __spec__.name if __name__ == '__main__' else __name__,
+        '--run-case', case, '--data-dir', str(dataDir), '--params', json.dumps(params), '--repeat', str(repeat), '--result', str(result_file)]
+    completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace')
+    if completed.returncode != 0 or not result_file.is_file():
+        return {'case': case, 'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'exit code ' + str(completed.returncode)}
+    with open(result_file) as fyle:
+        return json.load(fyle)
+
+
+
+# ============================================================================ #
+#    BENCHMARKS
+# ============================================================================ #
+
+def run_benchmarks(cases:list=None, dataParams:dict=None, repeat:int=3, outputPath=None, baselinePath=None, tolerance:float=0.1, dataDir=None, verbose=1) -> dict:
+    """
+    Builds the synthetic data and runs the benchmark cases, each one in its own subprocess.
+
+    ARGUMENTS:
+      cases (list, optional): Names of the cases to run (keys of CASES). Default is None (all of them).
+
+      dataParams (dict, optional): Settings of the synthetic data that override DEFAULT_DATA_PARAMS. Default is None.
+
+      repeat (int, optional): Number of times each case is run. The best time is used for the throughput, since it is the least disturbed by other activity on the machine. Default is 3.
+
+      outputPath (str or Path, optional): A JSON file to write the results to. Default is None.
+
+      baselinePath (str or Path, optional): A results JSON file from an earlier run to compare against (see compare_to_baseline). Default is None.
+
+      tolerance (float, optional): Relative change beyond which a comparison is reported as a regression. Default is 0.1 (10%).
+
+      dataDir (str or Path, optional): A folder to build the data in and keep it. The data is reused by later runs as long as it was built with the same data params (recorded in data_params.json), and rebuilt otherwise. Default is None, which uses a temporary folder that is deleted afterwards.
+
+      verbose (int, optional): Print a table of the results (and of the comparison). Default is 1.
+
+    RETURNS:
+    A dict with 'meta' (machine, versions, data settings), 'results' (one dict per case with files_per_s, mb_per_s (None for the tree cases, which don't read file contents), peak_rss_mb etc.) and, if a baseline was given, 'comparison'. peak_rss_mb is the peak of the process that ran the case, so it doesn't include the worker processes of image_resize(workers>1), and rss_before_mb is its memory just before the first run (imports and the list of files).
+
+    """
+
+    params = dict(DEFAULT_DATA_PARAMS, **(dataParams or {}))
+    cases = list(CASES) if cases is None else cases
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        print('ERROR: Unknown benchmark cases', unknown, '- valid cases are', list(CASES), '. Function exiting.')
+        return None
+
+    temp_dir = None
+    if dataDir is None:
+        temp_dir = tempfile.mkdtemp(prefix='pvnrt_bench_')
+        dataDir = temp_dir
+    data_dir = Path(dataDir)
+    try:
+        # build the data sets that the chosen cases need, unless they are already there and were built with the same params
+        stamp_path = Path(data_dir, 'data_params.json')
+        stamp = {}
+        if stamp_path.is_file():
+            with open(stamp_path) as fyle:
+                stamp = json.load(fyle)
+        for data_set in sorted({CASES[case][0] for case in cases}):
+            set_params = {key: params[key] for key in _DATA_SET_PARAMS[data_set]}
+            set_dir = Path(data_dir, data_set)
+            if set_dir.is_dir() and stamp.get(data_set) == set_params:
+                continue
+            if verbose>0:
+                print('Building the synthetic', 'file tree...' if data_set == 'tree' else 'images...')
+            shutil.rmtree(set_dir, ignore_errors=True)
+            if data_set == 'tree':
+                make_tree(set_dir, params['treeDepth'], params['treeBreadth'], params['filesPerDir'], params['fileSizeKB'], params['treeExts'])
+            else:
+                make_images(set_dir, params['imageCount'], params['imageWidth'], params['imageHeight'], params['imageFormat'], params['imageDirs'])
+            stamp[data_set] = set_params
+            with open(stamp_path, 'w') as fyle:
+                json.dump(stamp, fyle, indent=2)
+
+        results = []
+        for case in cases:
+            if verbose>0:
+                print('Running', case, '...')
+            results.append(_run_case_subprocess(case, data_dir, params, repeat))
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pillow': Image.__version__,
+            'repeat': repeat,
+            'data_params': params,
+        },
+        'results': results,
+    }
+    if verbose>0:
+        print_results(results)
+
+    if baselinePath is not None:
+        with open(baselinePath) as fyle:
+            baseline = json.load(fyle)
+        report['comparison'] = compare_to_baseline(report, baseline, tolerance)
+        if verbose>0 and report['comparison'] is not None:
+            print_comparison(report['comparison'])
+
+    if outputPath is not None:
+        with open(outputPath, 'w') as fyle:
+            json.dump(report, fyle, indent=2)
+
+    return report
+
+def compare_to_baseline(report:dict, baseline:dict, tolerance:float=0.1) -> list:
+    """
+    Compares the results of run_benchmarks to a baseline report (e.g. loaded from an earlier outputPath). Throughput (files_per_s, mb_per_s) is a regression if it dropped by more than `tolerance` (relative), peak_rss_mb if it grew by more than that. Cases missing from either report (which is pointed out), or that failed, are skipped.
+
+    RETURNS:
+    A list of dicts with case, metric, baseline, current, change (relative, e.g. -0.25 for 25% lower) and status ('regression', 'improvement' or 'ok'). Returns None if the two reports were run on synthetic data with different data params, since their throughputs can't be compared.
+
+    """
+    # runs on data sets of a different size would show up as regressions or improvements
+    params = report.get('meta', {}).get('data_params')
+    baseline_params = baseline.get('meta', {}).get('data_params')
+    if params != baseline_params:
+        changed = sorted(key for key in set(params or {}) | set(baseline_params or {}) if (params or {}).get(key) != (baseline_params or {}).get(key))
+        print('ERROR: The baseline was run with different data params', changed, '- rerun it with the same params to compare. Function exiting.')
+        return None
+    cases = {item['case'] for item in report['results']}
+    baseline_cases = {item['case'] for item in baseline.get('results', [])}
+    if cases != baseline_cases:
+        print('Note: only the cases run in both reports are compared. Only in this run:', sorted(cases - baseline_cases), '- only in the baseline:', sorted(baseline_cases - cases))
+    baseline_results = {item['case']: item for item in baseline.get('results', []) if 'error' not in item}
+    rows = []
+    for item in report['results']:
+        old = baseline_results.get(item['case'])
+        if old is None or 'error' in item:
+            continue
+        for metric, higher_is_better in [('files_per_s', True), ('mb_per_s', True), ('peak_rss_mb', False)]:
+            if not item.get(metric) or not old.get(metric):
+                continue
+            change = item[metric] / old[metric] - 1
+            better = change > tolerance if higher_is_better else change < -tolerance
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            rows.append({
+                'case': item['case'],
+                'metric': metric,
+                'baseline': old[metric],
+                'current': item[metric],
+                'change': change,
+                'status': 'regression' if worse else 'improvement' if better else 'ok',
+            })
+    return rows
+
+def print_results(results:list):
+    """
+    Prints the results of run_benchmarks as a table.
+    """
+    def number(value, digits:int=1) -> str:
+        return '-' if value is None else '{:.{}f}'.format(value, digits)
+    print('{:<26}{:>8}{:>10}{:>10}{:>12}{:>10}{:>13}'.format('CASE', 'FILES', 'MB', 'BEST S', 'FILES/S', 'MB/S', 'PEAK RSS MB'))
+    for item in results:
+        if 'error' in item:
+            print('{:<26}ERROR: {}'.format(item['case'], item['error']))
+            continue
+        print('{:<26}{:>8}{:>10.1f}{:>10.3f}{:>12}{:>10}{:>13}'.format(item['case'], item['files'], item['mb'], item['seconds_best'],
+            number(item['files_per_s']), number(item['mb_per_s']), number(item['peak_rss_mb'])))
+
+def print_comparison(rows:list):
+    """
+    Prints the output of compare_to_baseline as a table.
+    """
+    print('{:<26}{:<14}{:>12}{:>12}{:>10}  STATUS'.format('CASE', 'METRIC', 'BASELINE', 'CURRENT', 'CHANGE'))
+    for row in rows:
+        print('{:<26}{:<14}{:>12.1f}{:>12.1f}{:>+10.1%}  {}'.format(row['case'], row['metric'], row['baseline'], row['current'], row['change'], row['status'].upper()))
+
+
+
+# ============================================================================ #
+#    COMMAND LINE
+# ============================================================================ #
+
+def main(argv:list=None) -> int:
+    """
+    Command line entry point, e.g.
+
+        python -m pvnrt.bench --output results.json
+        python -m pvnrt.bench --cases image_resize image_resize_workers --baseline results.json --tolerance 0.05
+
+    Returns 1 if a comparison against a baseline found a regression (so it can fail a CI job), 2 if the benchmarks or the comparison could not be run, and 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description='Throughput benchmarks for pvnrt.core')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), help='cases to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case (default: 3)')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='relative change reported as a regression (default: 0.1)')
+    parser.add_argument('--data-dir', help='folder to build (and keep) the synthetic data in')
+    parser.add_argument('--params', default='{}', help='JSON dict overriding DEFAULT_DATA_PARAMS, e.g. \'{"imageCount": 500}\'')
+    # used internally to run a single case in a subprocess
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    params = dict(DEFAULT_DATA_PARAMS, **json.loads(args.params))
+    if args.run_case:
+        result = _run_case_here(args.run_case, args.data_dir, params, args.repeat)
+        with open(args.result, 'w') as fyle:
+            json.dump(result, fyle)
+        return 0
+
+    report = run_benchmarks(args.cases, params, args.repeat, args.output, args.baseline, args.tolerance, args.data_dir)
+    if report is None:
+        return 2
+    if args.baseline and report['comparison'] is None:
+        return 2
+    return 1 if any(row['status'] == 'regression' for row in report.get('comparison', [])) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,6 +29,23 @@ from tqdm import tqdm
 import numpy as np
 import math
 import ctypes, sys
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import queue
+import sqlite3
+import threading
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+import json
+import hashlib
+import heapq
+import time
+import asyncio
+import functools
+import collections
+import io
+import errno
+import glob
 
 
 #
@@ -61,9 +78,196 @@ def is_admin():
 
 
 
+#    COMPACT PATH TABLE
+# -------------------------------------------------------------------- #
+class PathTable(Sequence):
+
+    """
+    A compact, list-like collection of file paths, meant for very large file listings (tens of millions of files) where a Python list of strings or Path objects would cost hundreds of bytes per entry. Directory prefixes are stored only once (interned) and each entry only keeps the integer id of its directory. All filenames are stored back to back in one contiguous utf-8 buffer, and each entry keeps integer start and end offsets into it. This brings the cost down to about 20 bytes plus the length of the filename per entry.
+
+    Indexing a table returns a pathlib Path (negative indices work), and slicing it, or indexing it with an array of integers or booleans, returns a new PathTable. Since it is a Sequence, it can be passed to anything that expects a list of paths (random.sample, len, iteration etc.). Operations that work on directories (strip_head, filter_dirs) are applied once per unique directory and then mapped onto all entries with NumPy, instead of once per file.
+
+    For example,
+
+        paths = pv.core.filetype_search(SRC_PATH, ['png', 'jpg'], asTable=True)
+        paths = pv.core.remove_path_head(paths, 2)
+        first_path = paths[0]
+
+    """
+
+    def __init__(self, paths=()):
+
+        """
+        Creates a table from any iterable of paths (strings or Path objects). Passing a generator (e.g. iter_filetype_search) avoids holding a full list at any point.
+        """
+
+        self._dirs = []               # interned directory prefixes
+        self._dir_index = {}          # directory prefix -> position in self._dirs
+        self._dir_ids = array('i')    # directory of each entry
+        self._names = bytearray()     # all filenames, utf-8 encoded, back to back
+        self._starts = array('q')     # start offset of each filename in self._names
+        self._ends = array('q')       # end offset of each filename in self._names
+        for path in paths:
+            self.append(path)
+
+    @classmethod
+    def _from_parts(cls, dirs:list, dirIDs, names:bytearray, starts, ends):
+        """
+        Creates a table from already built parts. NumPy arrays are copied into compact arrays. The names buffer is shared and not copied.
+        """
+        table = cls()
+        table._dirs = list(dirs)
+        table._dir_index = {item: i for i, item in enumerate(table._dirs)}
+        table._dir_ids.frombytes(np.ascontiguousarray(dirIDs, dtype=np.int32).tobytes())
+        table._names = names
+        table._starts.frombytes(np.ascontiguousarray(starts, dtype=np.int64).tobytes())
+        table._ends.frombytes(np.ascontiguousarray(ends, dtype=np.int64).tobytes())
+        return table
+
+    def append(self, path):
+        """
+        Adds a path (string or Path) to the end of the table.
+        """
+        head, tail = os.path.split(os.fspath(path))
+        dir_id = self._dir_index.get(head)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dir_index[head] = dir_id
+            self._dirs.append(head)
+        self._dir_ids.append(dir_id)
+        self._starts.append(len(self._names))
+        self._names += tail.encode('utf-8', 'surrogateescape')
+        self._ends.append(len(self._names))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def _name(self, i:int) -> str:
+        return self._names[self._starts[i]:self._ends[i]].decode('utf-8', 'surrogateescape')
+
+    def _str(self, i:int) -> str:
+        return os.path.join(self._dirs[self._dir_ids[i]], self._name(i))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(len(self))))
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if not 0 <= key < len(self):
+                raise IndexError('PathTable index out of range')
+            return Path(self._str(key))
+        return self.take(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Path(self._str(i))
+
+    def __repr__(self):
+        return 'PathTable({} paths in {} directories)'.format(len(self), len(self._dirs))
+
+    @property
+    def dirs(self) -> list:
+        """
+        The list of unique directory prefixes held by the table.
+        """
+        return list(self._dirs)
+
+    @property
+    def dir_ids(self) -> np.ndarray:
+        """
+        NumPy array (int32) with the position in self.dirs of the directory of each entry. Useful as a grouping key, e.g. to keep files from the same folder together.
+        """
+        return np.frombuffer(self._dir_ids, dtype=np.int32).copy()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate memory used by the table in bytes (the directory strings are not counted).
+        """
+        return len(self._names) + self._dir_ids.itemsize*len(self._dir_ids) + self._starts.itemsize*len(self._starts) + self._ends.itemsize*len(self._ends)
+
+    def strings(self):
+        """
+        Generator of the paths as strings (cheaper than creating Path objects).
+        """
+        for i in range(len(self)):
+            yield self._str(i)
+
+    def take(self, indices):
+        """
+        Returns a new table holding only the entries at the given indices (array-like of integers) or where the given mask (array-like of booleans of the same length as the table) is True. The filename buffer is shared, not copied.
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64, copy=False)
+        return PathTable._from_parts(
+            self._dirs,
+            np.frombuffer(self._dir_ids, dtype=np.int32)[indices],
+            self._names,
+            np.frombuffer(self._starts, dtype=np.int64)[indices],
+            np.frombuffer(self._ends, dtype=np.int64)[indices],
+        )
+
+    def filter_dirs(self, function):
+        """
+        Returns a new table holding only the entries whose directory (string) passes the given function, e.g. lambda d: 'cats' in d. The function is called once per unique directory, not once per file.
+        """
+        keep = np.array([bool(function(item)) for item in self._dirs], dtype=bool)
+        return self.take(keep[np.frombuffer(self._dir_ids, dtype=np.int32)])
+
+    def filter_ext(self, file_exts):
+        """
+        Returns a new table holding only the files with the given extension(s), matched the same way as in filetype_search.
+        """
+        exts = _normalise_exts(file_exts)
+        keep = np.fromiter((_file_ext(self._name(i)) in exts for i in range(len(self))), dtype=bool, count=len(self))
+        return self.take(keep)
+
+    def strip_head(self, levels:int):
+        """
+        Returns a new table with the specified number of levels removed from the head of every path, after cleaning up any '..' in them (same as remove_path_head). Each unique directory is processed only once.
+        """
+        new_dirs = []
+        new_index = {}
+        mapping = np.empty(len(self._dirs), dtype=np.int32)
+        for i, item in enumerate(self._dirs):
+            parts = [part for part in Path(item).parts if part != '..'][levels:]
+            new_dir = str(Path(*parts)) if parts else ''
+            if new_dir not in new_index:
+                new_index[new_dir] = len(new_dirs)
+                new_dirs.append(new_dir)
+            mapping[i] = new_index[new_dir]
+        return PathTable._from_parts(
+            new_dirs,
+            mapping[np.frombuffer(self._dir_ids, dtype=np.int32)],
+            self._names,
+            np.frombuffer(self._starts, dtype=np.int64),
+            np.frombuffer(self._ends, dtype=np.int64),
+        )
+
+
+#    NORMALISE FILE EXTENSIONS
+# -------------------------------------------------------------------- #
+def _normalise_exts(file_exts) -> frozenset:
+    """
+    Converts the file extension(s) passed to the search functions (a string, tuple, list or set, with or without the leading '.', any case) into a frozenset of lowercase extensions without the '.'. A plain string is treated as a single extension, so that e.g. 'jpeg' doesn't also match files ending in '.jp' or '.eg'.
+    """
+    if isinstance(file_exts, str):
+        file_exts = [file_exts]
+    return frozenset(ext.lower().lstrip('.') for ext in file_exts)
+
+def _file_ext(name:str) -> str:
+    """
+    Returns the lowercase extension of a filename (the part after the last '.'), the way the search functions compare it.
+    """
+    return name.rpartition('.')[2].lower()
+
+
 #    SEARCH FOR FILES
 # -------------------------------------------------------------------- #
-def filetype_search(src_path, file_exts, verbose=0) -> list:
+def filetype_search(src_path, file_exts, verbose=0, asTable:bool=False) -> list:
 
     """
     Search for files with given extension(s) in a given directory and returns a list of file paths.
@@ -75,12 +279,14 @@ def filetype_search(src_path, file_exts, verbose=0) -> list:
 
       src_path (string, required): is the path to a directory. Make sure to construct the path using appropriate string or path building functions prior to passing in to this function. It can relative or absolute and will decide whether the output list of paths will contain relative or absolute paths.
 
-      file_exts (string, tuple or list, required): are the file extensions (lowercase and without the .) that are desired to be searched for. If there is only one extension, a string can be passed instead of a tuple/list. Filenames ending with the exact string are returned.
+      file_exts (string, tuple or list, required): are the file extensions (case and leading . don't matter) that are desired to be searched for. If there is only one extension, a string can be passed instead of a tuple/list. Files whose extension (the part after the last .) matches one of them exactly are returned.
 
       verbose (booloean, optional): prints a list of files if set to True, and prints only function status messages if set to False (default).
 
+      asTable (boolean, optional): If True, the paths are collected in a compact PathTable instead of a list. Recommended for very large listings. Default is False.
+
     RETURNS:
-    A list containing the paths to the found files. Paths are absolute or relative depending on what was passed to the function.
+    A list (or a PathTable if asTable is True) containing the paths to the found files. Paths are absolute or relative depending on what was passed to the function.
 
     For example,
     the following usage returns prescribed image files in the windows path provided and saves it in a list called src_file_list.
@@ -102,9 +308,11 @@ def filetype_search(src_path, file_exts, verbose=0) -> list:
 
     # convert passed path to a Path object, it's not necessary, the code will work even without this step, but converting it to a Path object gives us access to Path methods.
     src_path = Path(src_path)
+    # a set makes the extension check a single lookup, and treats a single string as one extension (and not as a sequence of characters to search in)
+    exts = _normalise_exts(file_exts)
 
-    # initialize a list of eligible paths, which will be the output of the function
-    paths = []
+    # initialize a list (or table) of eligible paths, which will be the output of the function
+    paths = PathTable() if asTable else []
 
     for root, subfolders, files in os.walk(src_path):
         # walks inside the root looking at each subfolder and file
@@ -113,8 +321,8 @@ def filetype_search(src_path, file_exts, verbose=0) -> list:
             TOTAL_SUBFOLDERS += 1 # just count the number of subfolders
         
         for file in files:
-            # split the file at the extension . and return the last element of the list (it's a str), convert it to lowercase and see if the str extension is part of the passed extension list/touple/string or not
-            if file.split('.')[-1].lower() in file_exts:
+            # take the part of the filename after the last ., convert it to lowercase and see if the extension is part of the passed extensions or not
+            if _file_ext(file) in exts:
                 TOTAL_FILES += 1
                 # path will be os independent and will start at the beginning of the provided src_path
                 # root here will include all the subdirectories that a file is in (IMPORTANT COMMENT)
@@ -130,13 +338,445 @@ def filetype_search(src_path, file_exts, verbose=0) -> list:
     return paths
 
 
+#    SEARCH FOR FILES (STREAMING)
+# -------------------------------------------------------------------- #
+def _put_unless_stopped(q:queue.Queue, item, stop) -> bool:
+    """
+    Puts an item on a bounded queue, waiting while it is full, but gives up (returns False) as soon as the stop event is set.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def iter_filetype_search(src_path, file_exts, prefetch:int=1000, workers:int=4):
+    """
+    Streaming version of filetype_search. Instead of building the complete list of paths first, it yields the path of each matching file as soon as the walk finds it, so that downstream work (image_resize, dataset splitting etc.) can start on the first file right away and the full list never has to be held in memory.
+
+    ARGUMENTS:
+
+      src_path (string or list, required): is the path to a directory, same as in filetype_search, or a list of such paths. Several directories are walked by the same scanner threads concurrently.
+
+      file_exts (string, tuple or list, required): are the file extensions (lowercase and without the .) that are desired to be searched for. Same as in filetype_search.
+
+      prefetch (int, optional): Size of the bounded queue between the scanner threads and the caller. The scanners pause when this many matches are waiting to be consumed, which caps the memory used no matter how big the tree is. Default is 1000.
+
+      workers (int, optional): Number of background scanner threads listing directories. If 0, no threads are used and the directories are walked (in os.walk order) only as the caller consumes the results. Default is 4.
+
+    RETURNS:
+    A generator of paths (strings) to the found files. With workers > 0, the order in which the files are yielded is not deterministic. If the caller stops iterating early (or the generator is closed), the scanner threads are stopped as well.
+
+    For example, the following usage starts resizing images while the search is still walking the tree.
+
+        for path in pv.core.iter_filetype_search(SRC_PATH, ['png', 'jpg']):
+            pv.core.image_resize([path], 224, 224, returnOnly=False)
+
+    """
+
+    # accept one or several directories
+    src_paths = [str(Path(item)) for item in src_path] if isinstance(src_path, (list, tuple)) else [str(Path(src_path))]
+    exts = _normalise_exts(file_exts)
+
+    # no background threads, just a lazy walk
+    if workers < 1:
+        for src in src_paths:
+            for root, subfolders, files in os.walk(src):
+                for file in files:
+                    if _file_ext(file) in exts:
+                        yield os.path.join(root, file)
+        return
+
+    matches = queue.Queue(maxsize=max(prefetch, 1))
+    pending = queue.Queue() # directories waiting to be listed, None tells a scanner thread to exit
+    stop = threading.Event()
+    lock = threading.Lock()
+    # number of directories queued or being listed, the walk is finished when it drops to zero
+    outstanding = [len(src_paths)]
+    done = object() # sentinel placed on the matches queue at the end of the walk
+
+    def finish():
+        for i in range(workers):
+            pending.put(None)
+        _put_unless_stopped(matches, done, stop)
+
+    def scanner():
+        while True:
+            path = pending.get()
+            if path is None:
+                return
+            subdirs = []
+            if not stop.is_set():
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            # same rules as os.walk: symlinks to directories are neither descended into nor returned as files
+                            if entry.is_dir():
+                                if not entry.is_symlink():
+                                    subdirs.append(entry.path)
+                            elif _file_ext(entry.name) in exts:
+                                if not _put_unless_stopped(matches, entry.path, stop):
+                                    break
+                except OSError:
+                    print('ERROR: problems reading directory {}'.format(path))
+            with lock:
+                outstanding[0] += len(subdirs) - 1
+                walk_finished = outstanding[0] == 0
+            for subdir in subdirs:
+                pending.put(subdir)
+            if walk_finished:
+                finish()
+
+    threads = [threading.Thread(target=scanner, daemon=True) for i in range(workers)]
+    if not src_paths:
+        return
+    for src in src_paths:
+        pending.put(src)
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = matches.get()
+            if item is done:
+                return
+            yield item
+    finally:
+        # also runs when the caller stops early, make sure that no thread is left waiting on a queue
+        stop.set()
+        for i in range(workers):
+            pending.put(None)
+
+
+#    DISCOVER FILES IN SEVERAL ROOTS
+# -------------------------------------------------------------------- #
+def _walk_root_by_ext(src:str, exts:frozenset) -> dict:
+    """
+    Walks a single directory tree with os.scandir and returns the matching file paths grouped by extension. Module level so that it can be sent to a process pool.
+    """
+    found = {ext: [] for ext in exts}
+    stack = [src]
+    while stack:
+        path = stack.pop()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                    else:
+                        ext = _file_ext(entry.name)
+                        if ext in exts:
+                            found[ext].append(entry.path)
+        except OSError:
+            print('ERROR: problems reading directory {}'.format(path))
+    return found
+
+def discover_files(srcPaths, file_exts, workers:int=8, useProcesses:bool=False, verbose=0) -> dict:
+    """
+    Searches several directory trees (e.g. image archives spread over several mounts) for files with the given extension(s) concurrently and returns the found paths grouped by extension. Extensions are matched with a single lookup in a precomputed set of normalised extensions.
+
+    ARGUMENTS:
+
+      srcPaths (string, Path or list, required): path to a directory or a list of paths to directories to be searched.
+
+      file_exts (string, tuple or list, required): file extension(s) to search for. See filetype_search for details.
+
+      workers (int, optional): Number of threads (or processes) used. Default is 8.
+
+      useProcesses (boolean, optional): If False (default), all directories of all roots are listed by a shared pool of threads (see iter_filetype_search), which works well when the listing waits on disks or network mounts. If True, each root is walked in its own process, which helps when there are a few roots holding a very large number of files and the per-file Python work becomes the bottleneck.
+
+      verbose (int, optional): prints a summary of the search if greater than 0. Default is 0.
+
+    RETURNS:
+    A dictionary with the normalised extensions (lowercase, without the .) as keys and lists of paths (strings) as values. Every requested extension has a key, even if no files were found. The order of the paths within each list is not deterministic.
+
+    For example,
+
+        found = pv.core.discover_files(['/mnt/archive1', '/mnt/archive2'], ['png', 'jpg', 'jpeg'])
+        jpg_files = found['jpg']
+
+    """
+
+    start_time = datetime.now().timestamp() # timer to measure how long the function ran for
+
+    src_paths = [str(Path(item)) for item in srcPaths] if isinstance(srcPaths, (list, tuple)) else [str(Path(srcPaths))]
+    exts = _normalise_exts(file_exts)
+    found = {ext: [] for ext in exts}
+
+    if useProcesses:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for root_found in executor.map(_walk_root_by_ext, src_paths, [exts]*len(src_paths)):
+                for ext, paths in root_found.items():
+                    found[ext].extend(paths)
+    else:
+        for path in iter_filetype_search(src_paths, exts, workers=workers):
+            found[_file_ext(path)].append(path)
+
+    if verbose>0:
+        print('Searched {} root(s) and found {} matching files [Processing time {} ms].'.format(len(src_paths), sum(len(paths) for paths in found.values()), processing_time(start_time, datetime.now().timestamp())))
+
+    return found
+
+
+#    FIND DUPLICATE FILES
+# -------------------------------------------------------------------- #
+def _partial_hash(path, partialBytes:int):
+    """
+    Hashes the first partialBytes of a file. Returns the partial digest, the hash object (so that the full hash can be continued later from where it stopped, without reading those bytes again) and the number of bytes read.
+    """
+    hasher = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as fyle:
+        chunk = fyle.read(partialBytes)
+    hasher.update(chunk)
+    return hasher.copy().digest(), hasher, len(chunk)
+
+def _finish_hash(path, hasher, offset:int, chunkBytes:int=1024*1024) -> bytes:
+    """
+    Continues a hash started by _partial_hash from the given offset to the end of the file and returns the full digest.
+    """
+    with open(path, 'rb') as fyle:
+        fyle.seek(offset)
+        for chunk in iter(lambda: fyle.read(chunkBytes), b''):
+            hasher.update(chunk)
+    return hasher.digest()
+
+def find_duplicate_files(filePaths:list, workers:int=8, partialBytes:int=64*1024, verbose=0) -> list:
+
+    """
+    Finds groups of byte-identical files, e.g. within the output of filetype_search. Files are first grouped by size, and only files sharing a size are hashed: first the beginning of the file (partialBytes), and only where that also matches, the rest of the file. The full hash continues from where the partial hash stopped, so every byte of a file is read at most once, and files with a unique size are never opened. Hashing runs in a pool of threads.
+
+    ARGUMENTS:
+
+      filePaths (list, required): A list (or PathTable) of paths to files.
+
+      workers (int, optional): Number of threads used for reading file sizes and hashing. Default is 8.
+
+      partialBytes (int, optional): Number of bytes read from the start of each file for the partial hash. Default is 64 KB.
+
+      verbose (int, optional): prints a summary if greater than 0. Default is 0.
+
+    RETURNS:
+    A list of duplicate groups. Each group is a list of two or more of the passed paths (in the order they were passed) whose contents are identical.
+
+    For example, the following removes all but the first copy of each file from a list of images.
+
+        paths = pv.core.filetype_search(SRC_PATH, ['png', 'jpg'])
+        groups = pv.core.find_duplicate_files(paths)
+        paths = pv.core.exclude_duplicate_files(paths, groups)
+
+    """
+
+    start_time = datetime.now().timestamp() # timer to measure how long the function ran for
+
+    file_paths = list(filePaths)
+
+    def file_size(path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            print('ERROR: problems reading file {}'.format(path))
+            return None
+
+    def partial_hash(i):
+        try:
+            return _partial_hash(file_paths[i], partialBytes)
+        except OSError:
+            print('ERROR: problems reading file {}. Skipping it.'.format(file_paths[i]))
+            return None
+
+    def full_hash(i):
+        try:
+            return _finish_hash(file_paths[i], partial[i][1], partial[i][2])
+        except OSError:
+            print('ERROR: problems reading file {}. Skipping it.'.format(file_paths[i]))
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        # group by size, only files sharing a size can be identical
+        sizes = list(executor.map(file_size, file_paths))
+        by_size = {}
+        for i, size in enumerate(sizes):
+            if size is not None:
+                by_size.setdefault(size, []).append(i)
+
+        groups = []
+        candidates = []
+        for size, indices in by_size.items():
+            if len(indices) < 2:
+                continue
+            # all empty files are identical, no need to open them
+            if size == 0:
+                groups.append(indices)
+            else:
+                candidates.extend(indices)
+
+        # group by size and the hash of the beginning of the files
+        # files that could not be read are dropped from their group
+        partial = {i: result for i, result in zip(candidates, executor.map(partial_hash, candidates)) if result is not None}
+        by_partial = {}
+        for i in partial:
+            by_partial.setdefault((sizes[i], partial[i][0]), []).append(i)
+
+        # group by the hash of the whole file
+        to_finish = []
+        for key, indices in by_partial.items():
+            if len(indices) < 2:
+                continue
+            if partial[indices[0]][2] < partialBytes:
+                # the whole file was already read, the partial hash is the full hash
+                groups.append(indices)
+            else:
+                to_finish.extend(indices)
+        full = executor.map(full_hash, to_finish)
+        by_full = {}
+        for i, digest in zip(to_finish, full):
+            if digest is None:
+                continue
+            by_full.setdefault((sizes[i], digest), []).append(i)
+        groups.extend(indices for indices in by_full.values() if len(indices) > 1)
+
+    groups = [[file_paths[i] for i in sorted(indices)] for indices in sorted(groups)]
+
+    if verbose>0:
+        print('Checked {} files and found {} groups of duplicates ({} redundant files) [Processing time {} ms].'.format(len(file_paths), len(groups), sum(len(group)-1 for group in groups), processing_time(start_time, datetime.now().timestamp())))
+
+    return groups
+
+def exclude_duplicate_files(filePaths:list, duplicateGroups:list) -> list:
+    """
+    Returns the list of paths without the redundant copies listed in duplicateGroups (see find_duplicate_files). The first path of each group is kept.
+    """
+    redundant = {str(path) for group in duplicateGroups for path in group[1:]}
+    return [path for path in filePaths if str(path) not in redundant]
+
+
+#    COPY/MOVE/LINK MANY FILES
+# -------------------------------------------------------------------- #
+# ioctl request number of FICLONE on Linux (_IOW(0x94, 9, int))
+_FICLONE = 0x40049409
+
+def _reflink(src, dst):
+    """
+    Creates dst as a copy-on-write clone of src (it shares the data blocks of src until either file is changed), with FICLONE on Linux (btrfs, xfs, bcachefs...) and clonefile on macOS (APFS). Raises OSError if the OS or the filesystem doesn't support it.
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+        created = False
+        try:
+            with open(src, 'rb') as src_file, open(dst, 'xb') as dst_file:
+                created = True
+                fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+        except OSError:
+            # remove the empty file left behind by a failed clone, but never a destination that existed before
+            if created:
+                os.remove(dst)
+            raise
+        shutil.copystat(src, dst)
+    elif sys.platform == 'darwin':
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(dst))
+    else:
+        raise OSError(errno.EOPNOTSUPP, 'Reflinks are not supported on this platform', str(dst))
+
+# the ways materialise_files can create a destination file
+MATERIALISE_STRATEGIES = ['copy', 'copy2', 'move', 'hardlink', 'symlink', 'reflink']
+
+def _materialise_file(src, dst, strategy:str, overWrite:bool):
+    if os.path.lexists(dst) and not (os.path.isdir(dst) and not os.path.islink(dst)):
+        if not overWrite:
+            raise FileExistsError(errno.EEXIST, 'Destination already exists', str(dst))
+        # removed up front for every strategy, since the link strategies can't replace a file and copying onto a link would write through it into its target
+        os.remove(dst)
+    if strategy == 'copy':
+        shutil.copy(src, dst)
+    elif strategy == 'copy2':
+        shutil.copy2(src, dst)
+    elif strategy == 'move':
+        shutil.move(src, dst)
+    elif strategy == 'hardlink':
+        os.link(src, dst)
+    elif strategy == 'symlink':
+        # absolute, so that the link works wherever dst is
+        os.symlink(os.path.abspath(src), dst)
+    else:
+        try:
+            _reflink(src, dst)
+        except OSError as error:
+            # like cp --reflink=auto, fall back to a full copy where cloning isn't possible, but not if the file itself is the problem
+            if isinstance(error, (FileNotFoundError, FileExistsError, PermissionError)):
+                raise
+            shutil.copy2(src, dst)
+
+def materialise_files(pairs, strategy:str='copy', workers:int=8, overWrite:bool=True, progressBar=None, verbose=0) -> list:
+    """
+    Copies, moves or links many files at once using a thread pool (file system calls release the GIL, and on network or SSD storage many requests in flight are much faster than one at a time).
+
+    ARGUMENTS:
+      pairs (iterable): (source path, destination file path) tuples. Missing destination folders are created.
+
+      strategy (str, optional): How each destination is created:
+        'copy'     - shutil.copy (data and permission bits)
+        'copy2'    - shutil.copy2 (data and all metadata such as timestamps)
+        'move'     - shutil.move
+        'hardlink' - a hard link to the source (no extra disk space, same filesystem only)
+        'symlink'  - a symbolic link to the absolute source path (no extra disk space; may need admin rights or developer mode on Windows)
+        'reflink'  - a copy-on-write clone (no extra disk space until the file is changed) where the filesystem supports it (btrfs, xfs, APFS...), a regular copy2 elsewhere
+      Default is 'copy'.
+
+      workers (int, optional): Number of threads. Default is 8.
+
+      overWrite (boolean, optional): If True, an existing destination file or link is replaced, whatever the strategy. If False, it is left alone and reported as failed with a FileExistsError. Default is True.
+
+      progressBar (tuple, optional): tqdm progress bar settings (ncols, ascii, colour). Default is None (no progress bar).
+
+      verbose (int, optional): Verbosity of prints. Default is 0.
+
+    RETURNS:
+    A list of (source, destination, exception) tuples for the files that failed (e.g. a missing source, or an existing destination if overWrite is False). The other files are done regardless. Returns None if the strategy is invalid.
+
+    """
+    if strategy not in MATERIALISE_STRATEGIES:
+        print('ERROR: Invalid strategy specified. Function exiting.')
+        return None
+    pairs = [(Path(src), Path(dst)) for src, dst in pairs]
+
+    # the destination folders are created once up front, rather than checked for every file
+    for folder in {dst.parent for _, dst in pairs}:
+        os.makedirs(folder, exist_ok=True)
+
+    def materialise(pair):
+        try:
+            _materialise_file(pair[0], pair[1], strategy, overWrite)
+            return None
+        except OSError as error:
+            return (pair[0], pair[1], error)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(materialise, pairs)
+        if progressBar is not None:
+            results = tqdm(results, total=len(pairs), ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2])
+        failed = [result for result in results if result is not None]
+
+    if verbose>0:
+        print('Materialised', len(pairs) - len(failed), 'of', len(pairs), 'files with strategy', repr(strategy) + '.')
+    return failed
+
+
 #    REMOVE HEADS FROM FILE PATHS
 # -------------------------------------------------------------------- #
 def remove_path_head(filePaths:list, levels:int):
     """
     Removes the specified number of levels from the head of the filepaths.
-    RETURNS: A list of Windows Path objects.
+    RETURNS: A list of Windows Path objects, or a PathTable if a PathTable was passed (in which case each unique directory is processed only once).
     """
+    if isinstance(filePaths, PathTable):
+        return filePaths.strip_head(levels)
     new_file_paths = []
     for fyle in filePaths:
         # convert to pathlib object
@@ -155,46 +795,82 @@ def remove_path_head(filePaths:list, levels:int):
 
 #    GET GLOB PATH LIST
 # -------------------------------------------------------------------- #
-def get_paths(path:Path, glob:str)->list:
+def get_paths(path:Path, glob:str, asTable:bool=False)->list:
 
     """
     Get list of paths within a given path with a given glob string. See pathlib.Path.glob() for more details.
-    Returns a list of paths found.
+    Returns a list of paths found, or a PathTable if asTable is True.
     """
-    glob_list = list(Path(path).glob(glob))
+    glob_list = PathTable(Path(path).glob(glob)) if asTable else list(Path(path).glob(glob))
     # raise error if no paths are found
     if len(glob_list) == 0:
         raise Exception('No matching paths found.')
     return glob_list
 
 
-#    FIND NEXT ID
+#    INTER-PROCESS FILE LOCK
 # -------------------------------------------------------------------- #
-def get_next_id(rootDir:Path, removePrefix:str, lenID:int, fileOrDir:str='dir'):
+@contextmanager
+def file_lock(lockPath, timeout:float=30):
 
     """
-    Finds the next ID (number, largest) from the given directory. The directory is expected to have folders with names containing an ID number of a fixed length. The ID number must be an integer. Maximum ID number is found and 1 is added to it and returned.
+    A simple cross-platform lock between processes (and threads), based on an operating system lock on a lock file (fcntl.flock on Linux/macOS, msvcrt.locking on Windows). Use it as a context manager. The operating system releases the lock when the block exits or when the process dies, so a crashed process can never leave a stale lock behind. The (empty) lock file itself is left in place, since removing it would let two processes lock two different files of the same name.
 
     ARGUMENTS:
-      
-      rootDir (string, required): Path to the folder inside which you wish to scan for IDs.
 
-      removePrefix (string, required): Part of the folder name that you wish to remove from the left to where the ID starts. Be sure to include spaces, hyphens etc. that need to be removed. They are not removed automatically.
+      lockPath (string or Path, required): Path of the lock file.
 
-      lenID (integer, required): number of digits that comprise the IDs. All IDs must be of the same length. The returned ID will also contain the same number of digits with leading zeroes.
+      timeout (number, optional): Seconds to wait for the lock before raising a TimeoutError. Default is 30.
 
-    RETURNS: A new string (not integer) ID (unique, incremented the maximum ID found in the folder by 1) is returned with the same length as the lenID, with enough leading zeroes.
+    For example,
+
+        with pv.core.file_lock('counter.lock'):
+            # read and update the counter
 
     """
 
-    # Check whether it is specified whether to check for files or directories for IDs
-    # Make sure it is one of them
-    if fileOrDir!='dir' and fileOrDir!='file':
-        print("ERROR: The value of the parameter fileOrDir must be one of 'file' or 'dir'. Function exiting.")
-    
+    lock_path = str(lockPath)
+    deadline = datetime.now().timestamp() + timeout
+    # every caller opens the file itself, so that threads of one process also exclude each other
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    try:
+        while True:
+            try:
+                if sys.platform == 'win32':
+                    import msvcrt
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except OSError:
+                # held by someone else
+                if datetime.now().timestamp() > deadline:
+                    raise TimeoutError('Could not acquire the lock {} within {} s.'.format(lock_path, timeout))
+                time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if sys.platform == 'win32':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+#    FIND NEXT ID
+# -------------------------------------------------------------------- #
+def _scan_max_id(rootDir:Path, removePrefix:str, lenID:int, fileOrDir:str, ignore:str=None) -> int:
+    """
+    Scans the given directory and returns the largest ID found (0 if none), see get_next_id. Names starting with ignore (the counter and lock files) are skipped.
+    """
     path = Path(rootDir)
     IDs = [0]
     for item in path.glob('*'):
+        if ignore and item.name.startswith(ignore):
+            continue
         if fileOrDir=='dir':
             if item.is_dir():
                 ID = item.name.removeprefix(removePrefix) if item.name[:len(removePrefix)]==removePrefix else None
@@ -207,10 +883,67 @@ def get_next_id(rootDir:Path, removePrefix:str, lenID:int, fileOrDir:str='dir'):
                 if ID:
                     ID = int(ID[:lenID])
                     IDs.append(ID)
-    newID = max(IDs) + 1
-    newID = str(newID).zfill(lenID)
+    return max(IDs)
+
+def _id_taken(rootDir:Path, removePrefix:str, ID:str, fileOrDir:str) -> bool:
+    """
+    Checks whether a file or folder (see fileOrDir) whose name starts with removePrefix followed by ID already exists in rootDir, e.g. one created by hand since the counter was last updated.
+    """
+    for item in Path(rootDir).glob(glob.escape(removePrefix + ID) + '*'):
+        if (item.is_dir() if fileOrDir=='dir' else item.is_file()):
+            return True
+    return False
+
+def get_next_id(rootDir:Path, removePrefix:str, lenID:int, fileOrDir:str='dir', counterFile:str=None, rescan:bool=False):
+
+    """
+    Finds the next ID (number, largest) from the given directory. The directory is expected to have folders with names containing an ID number of a fixed length. The ID number must be an integer. Maximum ID number is found and 1 is added to it and returned.
+
+    ARGUMENTS:
+      
+      rootDir (string, required): Path to the folder inside which you wish to scan for IDs.
+
+      removePrefix (string, required): Part of the folder name that you wish to remove from the left to where the ID starts. Be sure to include spaces, hyphens etc. that need to be removed. They are not removed automatically.
+
+      lenID (integer, required): number of digits that comprise the IDs. All IDs must be of the same length. The returned ID will also contain the same number of digits with leading zeroes.
+
+      counterFile (string, optional): Name of a small counter file (created inside rootDir) that remembers the last ID handed out. If passed, the next ID is read from and written back to this file under a file lock (see file_lock), instead of scanning the whole directory every time. This makes the call take the same (short) time no matter how many folders there are, and guarantees that two processes asking at the same time get different IDs. The directory is scanned only when the counter file is missing or unreadable, or when the ID the counter points to is already taken (e.g. by a folder created by hand), in which case the counter is reset from the scan. Separate counters are kept for each prefix and for files/dirs. Default is None, which means the directory is scanned on every call.
+
+      rescan (boolean, optional): Applicable when counterFile is passed. If True, the directory is scanned again and the counter is reset from it. Normally not needed, since a counter that points to an existing ID is detected and reset, but it also catches hand-made folders with IDs further ahead. Default is False.
 
-    return newID
+    RETURNS: A new string (not integer) ID (unique, incremented the maximum ID found in the folder by 1) is returned with the same length as the lenID, with enough leading zeroes.
+
+    """
+
+    # Check whether it is specified whether to check for files or directories for IDs
+    # Make sure it is one of them
+    if fileOrDir!='dir' and fileOrDir!='file':
+        print("ERROR: The value of the parameter fileOrDir must be one of 'file' or 'dir'. Function exiting.")
+    
+    if counterFile is None:
+        newID = _scan_max_id(rootDir, removePrefix, lenID, fileOrDir) + 1
+        return str(newID).zfill(lenID)
+
+    counter_path = Path(rootDir, counterFile)
+    key = fileOrDir + '|' + removePrefix
+    with file_lock(str(counter_path) + '.lock'):
+        # the counter file holds the last handed out ID for each kind of ID
+        try:
+            with open(counter_path, 'r') as fyle:
+                counters = json.load(fyle)
+        except (OSError, ValueError):
+            counters = {}
+        if rescan or not isinstance(counters.get(key), int) or _id_taken(rootDir, removePrefix, str(counters[key] + 1).zfill(lenID), fileOrDir):
+            counters[key] = _scan_max_id(rootDir, removePrefix, lenID, fileOrDir, ignore=counterFile)
+        newID = counters[key] + 1
+        counters[key] = newID
+        # write to a temporary file first and then replace the counter, so that a crash never leaves a half-written counter behind
+        temp_path = Path(rootDir, counterFile + '.tmp')
+        with open(temp_path, 'w') as fyle:
+            json.dump(counters, fyle)
+        os.replace(temp_path, counter_path)
+
+    return str(newID).zfill(lenID)
 
 #    FRIENDLY SIZE FROM BYTES
 # -------------------------------------------------------------------- #
@@ -245,9 +978,297 @@ def get_dir_size_file_count(path):
         print('ERROR: problems reading directory {}'.format(path))
     return size, file_count
 
+#    ASYNCHRONOUS FILESYSTEM LAYER
+# -------------------------------------------------------------------- #
+class AsyncFileSystem:
+
+    """
+    An asyncio layer over blocking filesystem calls. Every call is run in a thread pool and at most `concurrency` calls are in flight at the same time. On network shares (NFS, SMB), where every metadata request has a round trip of milliseconds, keeping many requests in flight makes scans many times faster than issuing them one after another. Within this module, only scan_tree (with useAsync=True) uses it. Other blocking calls can be passed to run(), and run_async() can be used to drive it from synchronous code.
+
+    For example,
+
+        async def count_entries(paths):
+            async with pv.core.AsyncFileSystem(concurrency=64) as fs:
+                listings = await asyncio.gather(*(fs.scandir(path) for path in paths))
+            return [len(entries) for entries in listings]
+
+        counts = pv.core.run_async(count_entries(paths))
+
+    """
+
+    def __init__(self, concurrency:int=64):
+        self.concurrency = concurrency
+        self._executor = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    async def run(self, function, *args, **kwargs):
+        """
+        Runs any blocking function in the thread pool, subject to the concurrency limit.
+        """
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def scandir(self, path) -> list:
+        """
+        Returns the list of os.DirEntry objects in a directory. The type and stat of each entry (without following symlinks) are fetched in the thread pool as well, and cached by the entries, so calling entry.is_dir(follow_symlinks=False) or entry.stat(follow_symlinks=False) on them afterwards doesn't block.
+        """
+        def listing(path):
+            with os.scandir(path) as entries:
+                entries = list(entries)
+            for entry in entries:
+                entry.is_dir(follow_symlinks=False)
+                entry.stat(follow_symlinks=False)
+            return entries
+        return await self.run(listing, path)
+
+    async def stat(self, path, follow_symlinks:bool=True):
+        return await self.run(os.stat, path, follow_symlinks=follow_symlinks)
+
+def run_async(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code and returns its result. Works also when an event loop is already running in this thread (e.g. in a Jupyter notebook), in which case the coroutine is run in a separate thread with its own event loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+#    LIST A SINGLE DIRECTORY (NON-RECURSIVE)
+# -------------------------------------------------------------------- #
+def _scan_single_dir(path, index=None):
+    """
+    Lists a single directory (no recursion) and returns the size and number of the files directly inside it, a list of paths of its immediate subdirectories, the modification time of the directory (ns, -1 if it could not be read) and whether the directory was actually listed. If an index (see _load_tree_index) is passed and the directory's modification time matches the one in the index, the cached values are returned without listing the directory.
+    """
+    size = 0
+    file_count = 0
+    subdirs = []
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        # a directory's mtime changes whenever an entry is added, removed or renamed inside it, so an unchanged mtime means that its listing is unchanged
+        if index is not None and path in index and index[path][0] == mtime:
+            cached_mtime, size, file_count, subdirs = index[path]
+            return size, file_count, subdirs, mtime, False
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                else:
+                    size += entry.stat(follow_symlinks=False).st_size
+                    file_count += 1
+    except OSError:
+        print('ERROR: problems reading directory {}'.format(path))
+        # a failed listing is stored with an mtime that never matches a real one, so the directory stays in its parent's cached listing and is listed again on the next scan
+        mtime = -1
+    return size, file_count, subdirs, mtime, True
+
+#    LOAD/SAVE DIRECTORY SIZE INDEX
+# -------------------------------------------------------------------- #
+def _load_tree_index(indexPath) -> dict:
+    """
+    Loads the on-disk directory index (SQLite) created by scan_tree. Returns a dictionary with directory paths as keys and (mtime in ns, size of own files, number of own files, list of subdirectory paths) as values. An empty dictionary is returned if the index file doesn't exist yet.
+    """
+    index = {}
+    if not Path(indexPath).is_file():
+        return index
+    with sqlite3.connect(indexPath) as connection:
+        rows = connection.execute('SELECT path, parent, mtime_ns, size, files FROM dirs').fetchall()
+    connection.close()
+    for path, parent, mtime, size, files in rows:
+        index[path] = (mtime, size, files, [])
+    # rebuild the list of subdirectories of each directory from the parent column
+    for path, parent, mtime, size, files in rows:
+        if parent in index:
+            index[parent][3].append(path)
+    return index
+
+def _save_tree_index(indexPath, changedRows:list, removedPaths:list):
+    """
+    Writes the directories that were (re-)listed during a scan to the on-disk directory index and removes the directories that no longer exist. changedRows holds tuples of (path, parent, mtime in ns, size of own files, number of own files).
+    """
+    with sqlite3.connect(indexPath) as connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER, size INTEGER, files INTEGER)')
+        connection.executemany('DELETE FROM dirs WHERE path = ?', [(path,) for path in removedPaths])
+        connection.executemany('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)', changedRows)
+    connection.close()
+
+#    SINGLE PASS TREE SCAN
+# -------------------------------------------------------------------- #
+def scan_tree(srcFolder, workers:int=8, progressBar=None, indexPath=None, useAsync:bool=False, topN:int=None, minSize:int=None) -> dict:
+    """
+    Walks a directory tree exactly once and returns the total size and total number of files of every directory in it, including the source folder itself. Each directory is listed only once (with os.scandir) by a pool of threads, and the totals of the children are then added up to their parents from the deepest level upwards. This replaces the approach of globbing every subdirectory and then re-walking each one of them, where the amount of work grows with the depth of the tree times the number of files.
+
+    ARGUMENTS:
+
+      srcFolder (string or Path, required): Path to the source folder.
+
+      workers (int, optional): Number of threads listing directories concurrently (or the concurrency limit when useAsync is True). Listing a directory mostly waits on the disk (or the network), so more threads than cores is fine. Default is 8.
+
+      progressBar (tuple, optional): Same format as the progressBar parameter of get_tree_size_df. If passed, a tqdm counter of the scanned directories is shown. Default is None (no progress bar).
+
+      indexPath (string or Path, optional): Path to an on-disk index file (SQLite) that stores the modification time, size and file count of every directory. If passed, only directories whose modification time changed since the last scan are listed again, the cached values are reused for all others, and the index is updated at the end. The file is created on the first scan. Use the same srcFolder string on every run, since directories are stored by path. Note that a directory's modification time changes when files are added, removed or renamed inside it, but not when an existing file is modified in place, so size changes of such files are only picked up after deleting the index. Default is None (no index).
+
+      useAsync (boolean, optional): If True, the directories are listed through the asyncio layer (AsyncFileSystem), with up to `workers` listings in flight at a time. Meant for network shares with high latency, where a large value of workers (e.g. 64) should be used. The result is the same. Default is False.
+
+      topN (int, optional): If passed, only the topN largest directories are returned. A heap of the current topN is kept while the totals are added up, so no other directory is carried any further. Note that the whole tree still has to be walked, since the size of a directory is only known once all of its subdirectories have been listed. Default is None (all directories).
+
+      minSize (int, optional): If passed, only directories whose total size is at least this many bytes are returned. Can be combined with topN. Default is None.
+
+    RETURNS: A dictionary with the directory paths (strings, starting with srcFolder) as keys and a list of [total size in bytes, total files] as values. Parents always come before their children. If topN or minSize is passed, the directories are ordered from the largest to the smallest instead.
+
+    """
+    src = str(Path(srcFolder))
+    index = None if indexPath is None else _load_tree_index(indexPath)
+    # size and file count of the files directly inside each directory, and the parent and depth of each directory
+    own = {}
+    parents = {src: None}
+    depths = {src: 0}
+    # directories that had to be listed again, to be written to the index
+    changed_rows = []
+    # the source folder is stored with its real parent, so that a later scan of a folder above it (whose listing may come from the index) still finds it
+    src_parent = os.path.dirname(src)
+    src_parent = None if src_parent == src else src_parent
+    bar = None if progressBar is None else tqdm(unit=' dirs', ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2])
+
+    def record(path, result):
+        # store the listing of a directory and return its subdirectories
+        size, file_count, subdirs, mtime, listed = result
+        own[path] = [size, file_count]
+        if listed:
+            changed_rows.append((path, src_parent if path == src else parents[path], mtime, size, file_count))
+        for subdir in subdirs:
+            parents[subdir] = path
+            depths[subdir] = depths[path] + 1
+        if bar is not None:
+            bar.update()
+        return subdirs
+
+    if useAsync:
+
+        async def walk():
+            async with AsyncFileSystem(concurrency=workers) as fs:
+
+                async def visit(path):
+                    subdirs = record(path, await fs.run(_scan_single_dir, path, index))
+                    await asyncio.gather(*(visit(subdir) for subdir in subdirs))
+
+                await visit(src)
+
+        run_async(walk())
+
+    else:
+        # finished listings are handed back to this thread through a queue, so that only this thread touches the dicts above
+        results = queue.Queue()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            def submit(path):
+                future = executor.submit(_scan_single_dir, path, index)
+                future.add_done_callback(lambda f: results.put((path, f)))
+
+            submit(src)
+            outstanding = 1
+            while outstanding:
+                path, future = results.get()
+                outstanding -= 1
+                for subdir in record(path, future.result()):
+                    submit(subdir)
+                    outstanding += 1
+
+    if bar is not None:
+        bar.close()
+
+    if indexPath is not None:
+        # directories of this tree that are in the index but were not reached anymore have been deleted
+        prefix = src if src.endswith(os.sep) else src + os.sep
+        removed_paths = [path for path in index if (path == src or path.startswith(prefix)) and path not in own]
+        _save_tree_index(indexPath, changed_rows, removed_paths)
+
+    # add the totals of each directory to its parent, starting from the deepest directories, so that every parent is complete before it is added to its own parent
+    pruning = topN is not None or minSize is not None
+    heap = [] # (size, path) of the directories to report, smallest on top
+    for path in sorted(own, key=depths.get, reverse=True):
+        parent = parents[path]
+        if parent is not None:
+            own[parent][0] += own[path][0]
+            own[parent][1] += own[path][1]
+        if pruning:
+            # the total of this directory is final at this point
+            size = own[path][0]
+            if minSize is not None and size < minSize:
+                continue
+            if topN is None or len(heap) < topN:
+                heapq.heappush(heap, (size, path))
+            elif size > heap[0][0]:
+                heapq.heapreplace(heap, (size, path))
+
+    if pruning:
+        return {path: own[path] for size, path in sorted(heap, reverse=True)}
+
+    # order the directories the way a recursive walk would list them (parents before children)
+    return {path: own[path] for path in sorted(own, key=lambda item: Path(item).parts)}
+
+#    WRITE DIR TREE SIZE TABLE TO PARQUET IN CHUNKS
+# ---------------------------------------------------------------------------- #
+def _path_levels(path:Path) -> list:
+    """
+    Returns the names of all the parts of a path, from the root to the path itself, the way the columns of get_tree_size_df are built.
+    """
+    levels = [path.name]
+    for parent in path.parents:
+        levels.append(parent.name)
+    levels.reverse()
+    return levels
+
+def _write_tree_size_parquet(tree:dict, srcFolder, outputPath, chunkSize:int, removeCommonPath:bool) -> Path:
+    """
+    Writes the output of scan_tree to a Parquet file, chunkSize rows at a time, so that the full table never has to exist in memory. Path-level columns are dictionary encoded (categorical in pandas) and sizes are stored as integer bytes. Used by get_tree_size_df.
+    """
+    # note that pyarrow will need to be installed via pip
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # all paths start with the source folder, so the levels up to and including it are the same in every row
+    first_level = len(_path_levels(Path(srcFolder))) if removeCommonPath else 0
+    # the columns have to be known before the first chunk is written, so find the deepest directory first (topN/minSizeMB may have left no directories at all, in which case an empty file with just the size columns is written)
+    num_levels = max((len(_path_levels(Path(path))) for path in tree), default=first_level)
+    level_names = ['level {}'.format(i) for i in range(first_level, num_levels)]
+    schema = pa.schema(
+        [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in level_names] +
+        [pa.field('size (bytes)', pa.int64()), pa.field('total files', pa.int64())]
+        )
+
+    def write_chunk(writer, rows):
+        columns = [pa.array([row[0][i] if i < len(row[0]) else '' for row in rows], pa.string()).dictionary_encode() for i in range(first_level, num_levels)]
+        columns.append(pa.array([row[1] for row in rows], pa.int64()))
+        columns.append(pa.array([row[2] for row in rows], pa.int64()))
+        writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+    output_path = Path(outputPath)
+    with pq.ParquetWriter(output_path, schema) as writer:
+        rows = []
+        for path, (size, num_files) in tree.items():
+            rows.append((_path_levels(Path(path)), size, num_files))
+            if len(rows) >= chunkSize:
+                write_chunk(writer, rows)
+                rows = []
+        if rows:
+            write_chunk(writer, rows)
+    return output_path
+
 #    PRINT DIR TREE SIZE TABLE
 # ---------------------------------------------------------------------------- #
-def get_tree_size_df(srcFolder, progressBar=(80,'▢▣','#CC6655'), removeCommonPath=True):
+def get_tree_size_df(srcFolder, progressBar=(80,'▢▣','#CC6655'), removeCommonPath=True, workers:int=8, indexPath=None, outputPath=None, chunkSize:int=100000, useAsync:bool=False, topN:int=None, minSizeMB:float=None):
     """
     This function returns a pandas dataframe with all the subdirectories and the total size of each subdirectory in a given source folder.
 
@@ -255,26 +1276,42 @@ def get_tree_size_df(srcFolder, progressBar=(80,'▢▣','#CC6655'), removeCommo
 
         srcFolder (string, required): Path to the source folder.
 
-        cleanDF (boolean, optional): If True, the returned dataframe will be cleaned of path parts from root to source.
+        progressBar (tuple, optional): Specifies the formatting and size of the tqdm progress bar, which counts the scanned directories. Default is (80,'▢▣','#CC6655'). Pass None to hide it.
+
+        removeCommonPath (boolean, optional): If True, the returned dataframe will be cleaned of path parts from root to source.
+
+        workers (int, optional): Number of threads used to list the directories. See scan_tree() for details. Default is 8.
 
-    RETURNS: A pandas dataframe with a column for each folder in path, a size column and a column showing total files within each folder.
+        indexPath (string or Path, optional): Path to an on-disk directory index (SQLite file). When passed, only the directories that changed since the previous run are listed again, which turns repeated scans of a mostly unchanged tree into a quick refresh. See scan_tree() for details and caveats. Default is None.
+
+        outputPath (string or Path, optional): Path to a Parquet file. If passed, no dataframe is built in memory. Instead, the rows are written to this file in chunks of chunkSize rows, with a categorical (dictionary encoded) column 'level N' for each path level, an integer 'size (bytes)' column and a 'total files' column. With removeCommonPath, the levels up to and including the source folder are left out. The file can be read later with pandas.read_parquet (optionally with columns= or filters=) or queried lazily with pyarrow.dataset. Requires pyarrow. Default is None.
+
+        chunkSize (int, optional): Number of rows written at a time when outputPath is passed. Default is 100000.
+
+        useAsync (boolean, optional): If True, directories are listed through the asyncio filesystem layer, which helps on high-latency network shares (use a large value of workers, e.g. 64). See scan_tree() for details. Default is False.
+
+        topN (int, optional): If passed, only the topN largest directories are reported, sorted from the largest down. Rows are only built for these directories, so the cost of the dataframe scales with topN and not with the size of the tree. Default is None (all directories).
+
+        minSizeMB (number, optional): If passed, only directories with a total size of at least this many MB are reported, sorted from the largest down. Can be combined with topN. Default is None.
+
+    RETURNS: A pandas dataframe with a column for each folder in path, a size column and a column showing total files within each folder. If outputPath is passed, the path (Path) to the written Parquet file is returned instead.
 
     TODO:
-    - Use single recursion instead of two. Glob in addition to the recursive scandir in inefficient, even though it may be fast enough for usage. For example, on a subdir ~batches in HDD3, it took 88 mins.
     - Ignore dirs starting with '.' or system directories. Or is there a way to ignore dirs that the script is not allowed to access?
 
     """
     master_table = []
     size_column = [] # because the row length will be variable, we will need to add the size column after df is created so it can be in its own column.
     # similarly
-    size = 0
-    num_files = 0
     size_gb_column = []
     num_files_column = []
-    src = Path(srcFolder)
-    list_root_paths = list(src.glob('**/'))
-    for path in tqdm(list_root_paths, ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2]):
-        size, num_files = get_dir_size_file_count(path)
+    # the tree is walked only once, see scan_tree()
+    tree = scan_tree(srcFolder, workers=workers, progressBar=progressBar, indexPath=indexPath, useAsync=useAsync,
+                     topN=topN, minSize=None if minSizeMB is None else minSizeMB * 1024 * 1024)
+    if outputPath is not None:
+        return _write_tree_size_parquet(tree, srcFolder, outputPath, chunkSize, removeCommonPath)
+    for path, (size, num_files) in tree.items():
+        path = Path(path)
         # get size in MBs and GBs so they can be sorted in excel file
         size = round(size / (1024 * 1024), 2)
         size_gb = round(size / 1024, 2)
@@ -295,8 +1332,12 @@ def get_tree_size_df(srcFolder, progressBar=(80,'▢▣','#CC6655'), removeCommo
     # replace None with empty string so the unique function works
     df.fillna('', inplace=True)
     if removeCommonPath:
-        nunique = df.nunique()
-        cols_to_drop = nunique[nunique == 1].index
+        if topN is not None or minSizeMB is not None:
+            # with only a few rows left, columns can hold a single value without being common to the whole tree (with one row, all of them would), so drop only the levels up to the source folder
+            cols_to_drop = [col for col in range(len(_path_levels(Path(srcFolder)))) if col in df.columns]
+        else:
+            nunique = df.nunique()
+            cols_to_drop = nunique[nunique == 1].index
         df.drop(cols_to_drop, axis=1, inplace=True)
     return df
 
@@ -433,56 +1474,356 @@ def processing_time(start_time:float, stop_time=datetime.now().timestamp(), unit
 # ============================================================================ #
 #
 
-#    IMAGE RESIZER
+#    DESTINATION OF A RESIZED IMAGE
 # -------------------------------------------------------------------- #
-def image_resize(
-    filePaths:list, 
-    width:int, height:int,
-    mode='contain',
-    dstPath='resized',
-    discardSrcLevels:int=0,
-    dstFileFormat=None,
-    dstFileExtension=None,
-    returnOnly=True,
-    clearDstDir=False,
-    overWrite=True,
-    progressBar=(80,'▢▣','#CC6655'),
-    verbose=0
+def _resized_dst_file(fyle:Path, dstPath, discardSrcLevels:int, dstFileExtension) -> Path:
+
+    """
+    Returns the path where image_resize saves the resized version of a given source file, following the rules described in image_resize.
+    """
+
+    file_name = fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension
+    # If user has chosen to save file in the same folder as the original
+    if dstPath=='source':
+        # IMPORTANT - clearing the destination directory in this case is a complicated process and hence skipping it for now. That is, if files are chosen to be placed inside their source folders, the 'resized' folder within will NOT be cleared before placing files there. The process is complicated because we want the folder to not be cleared on every file loop. We cannot keep this check outside the loop either, because each file's parent is probably different. 
+        return Path(fyle.parent, 'resized', file_name)
+    # If user has provided a destination folder path
+    # Remember that the file paths coming in can be of all kinds of lengths and may have no dir in common (unlikely though). Since we do not have a common source path, it it not possible to easily create a simple source structure by finding the common dir where all source file paths emerge from. For example, if all our files reside in D in the path '..\A\B\C\D\E,F,G\images, it will not be easy to figure out D just from the file paths. (1) We will have to recreate the entire source structure starting from A. User will have to manually delete A\B\C after the fact from file explorer, which is deemed doable. (2) Another alternative is to let the user provide a starting depth after which to start the source structure creation.
+    # Let's implement the above idea.
+    # This will extract parts of the source file paths devoid of '..'s
+    desired_src_structure = [item for item in fyle.parts if item != '..']
+    # this will keep only the path parts that start from the desired depth. Default is 0, which means that all parts will be kept. -1 is used to discard the filename itself.
+    desired_src_structure = desired_src_structure[discardSrcLevels:-1]
+    # convert the list to a path object
+    return Path(dstPath, *desired_src_structure, file_name)
+
+#    TEMPORARY NAME OF AN OUTPUT FILE
+def _temp_output_file(dstFile:Path) -> Path:
+    """
+    Returns a hidden temporary path next to dstFile (unique per process) to write an output to before it is renamed to dstFile.
+    """
+    return Path(dstFile.parent, '.tmp-' + str(os.getpid()) + '-' + dstFile.name)
+
+#    RESIZE A SINGLE IMAGE
+# -------------------------------------------------------------------- #
+def _resample_filter(resample):
+    """
+    Returns the Pillow resampling filter for resample, which may be a Pillow filter, one of the names 'nearest', 'box', 'bilinear', 'hamming', 'bicubic' or 'lanczos', or None for Pillow's default (bicubic).
+    """
+    if resample is None:
+        return Image.Resampling.BICUBIC
+    if isinstance(resample, str):
+        return Image.Resampling[resample.upper()]
+    return resample
+
+def _reduce_on_load(image, width:int, height:int, mode:str):
+    """
+    Shrinks the image by the largest power of two that still leaves it at least as large as needed for the final (width, height) resize in the given mode. JPEGs are decoded directly at the smaller scale (Pillow's draft mode, which is where most of the time is saved); anything that is left, and other formats, are shrunk with Image.reduce, which is a fast box filter on whole pixel blocks. The final resampling is done afterwards with _resize_reduced. Returns the shrunk image and the factor it was shrunk by.
+    """
+    def factor(size):
+        # fit crops, so both sides must stay at least as large as the target
+        # contain fits inside, so only the side that limits the scale has to
+        scales = (size[0] / width, size[1] / height)
+        return min(scales) if mode=='fit' else max(scales)
+
+    scale = 1
+    # JPEG decoding at 1/2, 1/4 or 1/8 scale (a no-op for other formats)
+    if image.format == 'JPEG' and factor(image.size) >= 2:
+        f = factor(image.size)
+        original_width = image.size[0]
+        drafted = image.draft(image.mode, (math.ceil(image.size[0] / f), math.ceil(image.size[1] / f)))
+        if drafted is not None:
+            # the box is the full image in decoded pixels, so its width gives the scale the decoder picked
+            scale = original_width / drafted[1][2]
+
+    k = 1
+    while k * 2 <= factor(image.size):
+        k *= 2
+    # palette and bilevel images can't be averaged in blocks, so they are left to the final resampling
+    if k >= 2 and image.mode not in ('1', 'P', 'PA'):
+        image = image.reduce(k)
+        scale *= k
+    return image, scale
+
+def _resize_reduced(image, originalSize:tuple, scale:float, width:int, height:int, mode:str, resample):
+    """
+    The final resize of ImageOps.fit or ImageOps.contain for an image shrunk by _reduce_on_load. The output size and the crop box are worked out from the original size of the image and the box is mapped onto the shrunk image, since the shrunk sides are rounded up and would otherwise skew the aspect ratio. The result has the same size and crop as a resize of the full resolution image.
+    """
+    original_width, original_height = originalSize
+    size = (width, height)
+    left, top, crop_width, crop_height = 0, 0, original_width, original_height
+    if mode=='fit':
+        # the centred crop of ImageOps.fit
+        output_ratio = width / height
+        if original_width / original_height > output_ratio:
+            crop_width = output_ratio * original_height
+        elif original_width / original_height < output_ratio:
+            crop_height = original_width / output_ratio
+        left = (original_width - crop_width) * 0.5
+        top = (original_height - crop_height) * 0.5
+    else:
+        # the output size of ImageOps.contain
+        if original_width / original_height > width / height:
+            size = (width, round(original_height / original_width * width))
+        elif original_width / original_height < width / height:
+            size = (round(original_width / original_height * height), height)
+    box = (left / scale, top / scale, (left + crop_width) / scale, (top + crop_height) / scale)
+    return image.resize(size, resample, box=box)
+
+def _resize_single_image(
+    fyle:Path,
+    dstFile:Path,
+    width:int, height:int,
+    mode:str,
+    dstFileFormat,
+    resample=None,
+    reduceOnLoad:bool=True
     ):
 
     """
-    
-    ARGUMENTS:
-    
-      filePaths (list, required): A list of paths of files meant to be resized. Files will not be modified in any way.
+    Resizes a single image and saves it to dstFile (unless dstFile is None). Kept at module level so that image_resize can send it to a process pool. Returns the resized image.
+    """
 
-      width (int, one of width or height is required) Target width of the image in pixels. If set to auto, utilizes the provided height parameter and sets a width that maintains the aspect ratio of the image.
+    # open image using the PIL Image library
+    with Image.open(fyle) as image:
+
+        #    CHEAP DOWNSCALE ON LOAD
+        # -------------------------------------------------------------------- #
+        original_size = image.size
+        scale = 1
+        if reduceOnLoad:
+            image, scale = _reduce_on_load(image, width, height, mode)
+
+        #    FIT MODES
+        # -------------------------------------------------------------------- #
+        resample = _resample_filter(resample)
+        if scale != 1:
+            new_image = _resize_reduced(image, original_size, scale, width, height, mode, resample)
+        elif mode=='fit':
+            new_image = ImageOps.fit(image, (width, height), method=resample)
+        else:
+            new_image = ImageOps.contain(image, (width, height), method=resample)
+        
+        #    SAVE
+        # -------------------------------------------------------------------- #
+        if dstFile is not None:
+            # create the directories where the resized image will reside
+            # (exist_ok, because with several worker processes another one may have just created them)
+            if dstFile.parent.is_dir()==False:
+                os.makedirs(dstFile.parent, exist_ok=True)
+            # saved under a temporary name and then renamed, so that an interrupted job never leaves a partial image behind
+            temp_file = _temp_output_file(dstFile)
+            try:
+                new_image.save(temp_file, dstFileFormat)
+                os.replace(temp_file, dstFile)
+            finally:
+                if temp_file.is_file():
+                    os.remove(temp_file)
+
+    return new_image
+
+#    RESIZE MANIFEST
+# -------------------------------------------------------------------- #
+def _load_json_manifest(manifestPath) -> dict:
+    """
+    Loads a JSON manifest written by image_resize. Returns an empty dict if the file doesn't exist or can't be read.
+    """
+    try:
+        with open(manifestPath, 'r') as fyle:
+            return json.load(fyle)
+    except (OSError, ValueError):
+        return {}
 
-      height (int, one of width or height is required) Target height of the image in pixels. If set to auto, utilizes the provided width parameter and sets a height that maintains the aspect ratio of the image.
+def _save_json_manifest(manifestPath, manifest:dict):
+    """
+    Writes a JSON manifest to a temporary file first and then replaces the old one, so that a crash never leaves a half-written manifest behind.
+    """
+    temp_path = Path(str(manifestPath) + '.tmp')
+    with open(temp_path, 'w') as fyle:
+        json.dump(manifest, fyle)
+    os.replace(temp_path, manifestPath)
 
-      mode (string, optional): Choose among 'fit' or 'contain'. Please see the documentation for Pillow's ImageOps module for details on these methods. In short, fit will resize and crop the image from the center in order to fit the image within the given width AND height while maintaining the aspect ratio. And, contain will resize the image within the given width or height, depending on which dimension keeps to maintain the aspect ratio intact. Default is 'contain'.
-      
-      dstPath (string, optional): Let's you choose the destination folder for the resized images. If 'source', then files are saved in their respective original source folder(s). If any thing other than 'source' is provided, then all the resized files will be saved to the specified folder (path). In this scenario, the directory structure of the input files is maintained within the specified destination folder. If the user is aware that the input file paths have a common root upto a certain level, then the user can specify the parameter 'discardSrcLevels' to discard a certain number of levels while replicating the dir structure of the input file paths. Default dstPath is 'resized', which means that a folder of this name will be created in the directory this script is running from and the files be stored within.
 
-      discardSrcLevels (int, optional): Applicable only when a dstPath other than 'source' is specified. If the user is aware that the input file paths have a common root upto a certain level, then the user can specify a velue to this parameter to discard a certain number of levels while replicating the dir structure of the input file paths. For example, if the input file path is '../a/b/c/d/e/image.png' and the user knows that they only want to replicate the source dirs from 'd' onwards, since the paths up to '../a/b/c/' are common, then the user should specify discardSrcLevels = 3. The default value is 0, which means the entire source path (excluding the ..s) will be replicated. 
+#    RESIZE CHECKPOINT
+# -------------------------------------------------------------------- #
+# A checkpoint file is one line of JSON (the job signature and the number of files) followed by a bitmap with one bit per file in filePaths, set once the file is done. A million files take 125 KB.
 
-      dstFileFormat (string, optional): Specifies the format of the saved file as per the PIL library. If no format is provided, PIL tries to detect the format from the filename extension. Default is None, which means that the format will be detected from the input image.
+def _resize_job_signature(filePaths:list, params:tuple) -> str:
+    """
+    Returns a hash of the list of files and the settings of a resize job, so that a checkpoint is only ever resumed by the same job.
+    """
+    hasher = hashlib.blake2b(repr(params).encode('utf-8'), digest_size=16)
+    for fyle in filePaths:
+        hasher.update(str(fyle).encode('utf-8', 'surrogateescape') + b'\0')
+    return hasher.hexdigest()
 
-      dstFileExtension (string, optional): Specifies the extension of the saved file. If no extension is provided, files extension will be used. Default is None.
+def _load_resize_checkpoint(checkpointPath, signature:str, count:int) -> np.ndarray:
+    """
+    Returns a boolean array with the files marked done in the checkpoint, or all False if there is no checkpoint or it belongs to a different job.
+    """
+    try:
+        with open(checkpointPath, 'rb') as fyle:
+            header = json.loads(fyle.readline())
+            bits = np.frombuffer(fyle.read(), dtype=np.uint8)
+        if header.get('signature') == signature and header.get('count') == count:
+            return np.unpackbits(bits, count=count).astype(bool)
+    except (OSError, ValueError):
+        pass
+    return np.zeros(count, dtype=bool)
 
-      returnOnly (boolean, optional): Gives the user the option to also save the files to disk (False) in addition to returning the images as a PIL image object. Default is True, which means that images will only be returned by the function and not actually saved to the disk.
+def _save_resize_checkpoint(checkpointPath, signature:str, done:np.ndarray):
+    """
+    Writes a checkpoint to a temporary file first and then replaces the old one, so that a crash never leaves a half-written checkpoint behind.
+    """
+    temp_path = Path(str(checkpointPath) + '.tmp')
+    with open(temp_path, 'wb') as fyle:
+        fyle.write(json.dumps({'signature': signature, 'count': len(done)}).encode('utf-8') + b'\n')
+        fyle.write(np.packbits(done).tobytes())
+    os.replace(temp_path, checkpointPath)
 
-      clearDstDir (boolean, optional): Applicable only to the case where dstPath != 'source'. If True, it deletes the specified destination folder and everything within it before re-creating it and copying files to it. Note that this does not work when the destination directories are the source folders themselves (consider it a pending feature). Default is True.
 
-      overWrite (boolean, optional): Applicable when the returnOnly parameter is set to False. If True, files with the same name will be overwritten. If False, files with the same name will be skipped.
+#    RESIZE CACHE
+# -------------------------------------------------------------------- #
+def _resize_cache_file(cacheDir, fyle:Path, params:tuple) -> Path:
+    """
+    Returns the path of the cache entry for a source file resized with the given parameters. The key is a hash of the source file's identity (absolute path, size and modification time) and the parameters, so a changed source file or different settings never hit an old entry.
+    """
+    src_stat = os.stat(fyle)
+    key = repr((str(Path(fyle).resolve()), src_stat.st_size, src_stat.st_mtime_ns) + params)
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=20).hexdigest()
+    # the extension is kept so that the entry can be copied to the destination as is
+    return Path(cacheDir, digest[:2], digest + (params[-1] or fyle.suffix))
 
-      progressBar (tuple, optional): Specifies the formatting and size of the tqdm progress bar. Specify the tuple as (length of bar expressed as columns : int, ascii characters to form the bar : character sequence as string, color : color). Default is (80,'▢▣','#CC6655').
+def _load_from_resize_cache(cacheFile:Path, dstFile:Path):
+    """
+    Returns the cached resized image, copied to dstFile first unless dstFile is None. The image is only read into memory, not decoded (PIL decodes it when the pixels are first used). Raises OSError if the entry has gone missing in the meantime.
+    """
+    data = cacheFile.read_bytes()
+    # touching the entry marks it as recently used, for the eviction in _prune_resize_cache
+    os.utime(cacheFile)
+    if dstFile is not None:
+        if dstFile.parent.is_dir()==False:
+            os.makedirs(dstFile.parent, exist_ok=True)
+        temp_file = _temp_output_file(dstFile)
+        with open(temp_file, 'wb') as fyle:
+            fyle.write(data)
+        os.replace(temp_file, dstFile)
+    return Image.open(io.BytesIO(data))
+
+def _store_in_resize_cache(cacheFile:Path, dstFile:Path, image, dstFileFormat):
+    """
+    Adds a freshly resized image to the cache, by copying the saved file if there is one, or by saving the image otherwise. The entry is written to a temporary file first, so a reader never sees it half written. Images that can't be stored (e.g. an unsupported format) are simply not cached.
+    """
+    temp_file = cacheFile.with_name(cacheFile.name + '.' + str(os.getpid()) + '.tmp')
+    try:
+        os.makedirs(cacheFile.parent, exist_ok=True)
+        if dstFile is not None:
+            shutil.copyfile(dstFile, temp_file)
+        else:
+            image_format = dstFileFormat or Image.registered_extensions().get(cacheFile.suffix.lower())
+            image.save(temp_file, image_format)
+        os.replace(temp_file, cacheFile)
+    except (OSError, ValueError, KeyError):
+        if temp_file.is_file():
+            os.remove(temp_file)
+
+def _prune_resize_cache(cacheDir, maxBytes:int) -> int:
+    """
+    Deletes the least recently used entries of a resize cache until its total size is at most maxBytes. Returns the number of entries deleted.
+    """
+    entries = []
+    for entry in Path(cacheDir).glob('*/*'):
+        # entries that another process is still writing
+        if entry.suffix == '.tmp':
+            continue
+        try:
+            entry_stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((entry_stat.st_mtime_ns, entry_stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries):
+        if total <= maxBytes:
+            break
+        try:
+            os.remove(entry)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+#    IMAGE RESIZER ARGUMENT CHECKS
+# -------------------------------------------------------------------- #
+def _image_resize_args_ok(filePaths, mode, returnOnly:bool=True, checkpointPath=None) -> bool:
+    """
+    Checks the arguments of image_resize that would make it exit, and prints the reason.
+    """
+    if type(filePaths) != list:
+        print('ERROR: Argument filePaths must be passed in as a list. Function exiting.')
+        return False
+    if mode not in ['fit', 'contain']:
+        print('ERROR: Invalid mode specified. Function exiting.')
+        return False
+    if checkpointPath is not None and returnOnly:
+        print('ERROR: A checkpoint can only be used when the resized images are saved (returnOnly=False). Function exiting.')
+        return False
+    return True
 
-      verbose (boolean, optional): Allows user to specify the verbosity of logging prints on screen. Default is 0 (minimum verbosity).
+#    ORDERED MAP WITH A BOUNDED NUMBER OF TASKS IN FLIGHT
+# -------------------------------------------------------------------- #
+def _map_chunk(function, chunk:list) -> list:
+    return [function(*args) for args in chunk]
 
-    TO DO:
-    - currently, unable to clear 'resized' directory if user chooses destination as 'source' folder. This is because the logic is a tad bit complicated as noted in the comments.
-    - Don't read the files that already exist in the resized folder
+def _bounded_map(executor, function, argsList:list, chunkSize:int=1, window:int=8):
+    """
+    Like executor.map(function, ...) over a list of argument tuples, yielding the results in order, but with at most `window` chunks of chunkSize tasks submitted at any time. Results are therefore never piled up faster than the caller consumes them.
+    """
+    chunks = (argsList[i:i+chunkSize] for i in range(0, len(argsList), chunkSize))
+    in_flight = collections.deque()
+    for chunk in chunks:
+        in_flight.append(executor.submit(_map_chunk, function, chunk))
+        if len(in_flight) >= window:
+            yield from in_flight.popleft().result()
+    while in_flight:
+        yield from in_flight.popleft().result()
+
+
+#    IMAGE RESIZER (STREAMING)
+# -------------------------------------------------------------------- #
+def iter_image_resize(
+    filePaths:list, 
+    width:int, height:int,
+    mode='contain',
+    dstPath='resized',
+    discardSrcLevels:int=0,
+    dstFileFormat=None,
+    dstFileExtension=None,
+    returnOnly=True,
+    clearDstDir=False,
+    overWrite=True,
+    progressBar=(80,'▢▣','#CC6655'),
+    verbose=0,
+    workers:int=1,
+    incremental:bool=False,
+    manifestPath=None,
+    resample=None,
+    reduceOnLoad:bool=True,
+    cacheDir=None,
+    cacheSizeMB:float=1024,
+    checkpointPath=None,
+    checkpointEvery:int=1000
+    ):
+
+    """
+    Generator version of image_resize. Takes the same arguments and resizes (and saves, if returnOnly is False) the images in the same way, but instead of collecting all the resized images in a dict, it yields a (source path, resized PIL image) tuple for each image as soon as it is ready, in the order of filePaths. Nothing is kept after it has been yielded, so memory use doesn't grow with the size of the dataset. With workers > 1, only a bounded number of images are in flight in the process pool at any time. Files skipped because of overWrite or incremental are not yielded.
+
+    For example, the following saves resized images to disk while only ever holding a few of them in memory.
+
+        for path, image in pv.core.iter_image_resize(paths, 224, 224, returnOnly=False):
+            pass
 
     """
 
@@ -491,7 +1832,6 @@ def image_resize(
     #    Initialize things
     # ==================================================================== #
     
-    return_images = {} # key can correspond to the original image path
     skipped = 0
 
 
@@ -499,12 +1839,21 @@ def image_resize(
     #    PREPARE PATH(S)
     # ==================================================================== #
 
-    # Make sure that the source file paths are coming in as list and are formatted as Path objects
-    if type(filePaths) != list:
-        print('ERROR: Argument filePaths must be passed in as a list. Function exiting.')
-        return None
+    # Make sure that the source file paths are coming in as list and the mode is valid, before any file or folder is touched
+    if not _image_resize_args_ok(filePaths, mode, returnOnly, checkpointPath):
+        return
+    # format the file paths as Path objects
     file_paths = [Path(item) for item in filePaths]
 
+    # the checkpoint is read before anything is cleared, since a resumed job must keep the outputs of the files that are already done
+    resuming = False
+    if checkpointPath is not None:
+        signature = _resize_job_signature(file_paths, (width, height, mode, str(dstPath), discardSrcLevels, dstFileFormat, dstFileExtension, str(resample), reduceOnLoad, clearDstDir))
+        done = _load_resize_checkpoint(checkpointPath, signature, len(file_paths))
+        resuming = bool(done.any())
+        if verbose>0 and resuming:
+            print('Resuming from checkpoint,', int(done.sum()), 'of', len(file_paths), 'files are already done.')
+
     # If the destination is same as source folder (specified by the value 'source')
     if dstPath == 'source':
         # PLACEHOLDER: this condition will be tackled for each image inside the loop
@@ -517,7 +1866,11 @@ def image_resize(
             if returnOnly==False:
                 os.makedirs(dst_path)
         else:
-            if clearDstDir:
+            if clearDstDir and resuming:
+                # the destination was already cleared when the job was first started
+                if verbose>0:
+                    print('Not clearing', dst_path, 'because the job is resumed from a checkpoint.')
+            elif clearDstDir:
                 if returnOnly==False:
                     # remove directory and everything inside if user so desires
                     shutil.rmtree(dst_path)
@@ -530,83 +1883,632 @@ def image_resize(
     #    RESIZE >> SAVE OR RETURN
     # ==================================================================== #
     
-    # loop through each image path
-    for fyle in tqdm(file_paths, ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2]):
-
-        # open image using the PIL Image library
-        with Image.open(fyle) as image:
-            
-            #    FIT MODES
-            # -------------------------------------------------------------------- #
-            if mode=='fit':
-                new_image = ImageOps.fit(image, (width, height))
-            elif mode=='contain':
-                new_image = ImageOps.contain(image, (width, height))
-            else:
-                print('ERROR: Invalid mode specified. Function exiting.')
-                return None
-            
-            #    HANDLE SAVE/RETURN FOR EACH IMAGE
-            # -------------------------------------------------------------------- #
-            # If user has chosen to save the files to disk
-            if not returnOnly:
-                # If user has chosen to save file in the same folder as the original
-                # Note that we don't need to check if parent directories exist
-                if dstPath=='source':
-                    # check whether the 'resized' directory exists or not, if not create it
-                    # this condition will only be false for the first file iteration
-                    if Path(fyle.parent, 'resized').is_dir()==False:
-                        os.mkdir(Path(fyle.parent, 'resized'))
-                    # IMPORTANT - clearing the destination directory in this case is a complicated process and hence skipping it for now. That is, if files are chosen to be placed inside their source folders, the 'resized' folder within will NOT be cleared before placing files there. The process is complicated because we want the folder to not be cleared on every file loop. We cannot keep this check outside the loop either, because each file's parent is probably different. 
-                    
-                    # Now check whether the file exists or not and whether overwrite is set to true or not
-                    if Path(fyle.parent, 'resized', fyle.name).is_file():
-                        if overWrite:
-                            new_image.save(Path(fyle.parent, 'resized', fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension), dstFileFormat)
-                        else:
-                            skipped +=1
-                            if verbose>1:
-                                print('File', fyle.name, 'already exists. Overwrite not permitted. Skipping.')
-                    else:
-                        new_image.save(Path(fyle.parent, 'resized', fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension), dstFileFormat)
-                # If user has provided a destination folder path
+    #    SKIP FILES THAT DON'T NEED TO BE RESIZED (WITHOUT OPENING THEM)
+    # -------------------------------------------------------------------- #
+    manifest = _load_json_manifest(manifestPath) if manifestPath is not None else None
+    dst_files = []
+    to_resize = []
+    to_resize_index = []
+    for index, fyle in enumerate(file_paths):
+        if checkpointPath is not None and done[index]:
+            continue
+        dst_file = None if returnOnly else _resized_dst_file(fyle, dstPath, discardSrcLevels, dstFileExtension)
+        if dst_file is not None and dst_file.is_file():
+            # check whether overwrite is set to true or not
+            if not overWrite:
+                skipped +=1
+                if verbose>1:
+                    print('File', dst_file.name, 'already exists. Overwrite not permitted. Skipping.')
+                continue
+            # check whether the existing file is up to date
+            if incremental:
+                src_stat = os.stat(fyle)
+                if manifest is not None:
+                    up_to_date = manifest.get(str(fyle)) == [src_stat.st_size, src_stat.st_mtime_ns]
                 else:
-                    # Remember that the file paths coming in can be of all kinds of lengths and may have no dir in common (unlikely though). Since we do not have a common source path, it it not possible to easily create a simple source structure by finding the common dir where all source file paths emerge from. For example, if all our files reside in D in the path '..\A\B\C\D\E,F,G\images, it will not be easy to figure out D just from the file paths. (1) We will have to recreate the entire source structure starting from A. User will have to manually delete A\B\C after the fact from file explorer, which is deemed doable. (2) Another alternative is to let the user provide a starting depth after which to start the source structure creation.
-                    # Let's implement the above idea.
-                    desired_src_structure = []
-                    # This will extract parts of the source file paths devoid of '..'s
-                    desired_src_structure = [item for item in fyle.parts if item != '..']
-                    # this will keep only the path parts that start from the desired depth. Default is 0, which means that all parts will be kept. -1 is used to discard the filename itself.
-                    desired_src_structure = desired_src_structure[discardSrcLevels:-1]
-                    # convert the list to a path object and overwrite the list
-                    desired_src_structure = Path(*desired_src_structure)
-                    if Path(dst_path, desired_src_structure).is_dir()==False:
-                        # create the directories where the resized image will reside
-                        os.makedirs(Path(dst_path, desired_src_structure))
-                        new_image.save(Path(dst_path, desired_src_structure, fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension), dstFileFormat)
-                    else:
-                        # since the destination dir exists, check whether the file exists or not and if overwrite is set to true or not
-                        if Path(dst_path, desired_src_structure, fyle.name).is_file():
-                            if overWrite:
-                                new_image.save(Path(dst_path, desired_src_structure, fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension), dstFileFormat)
-                            else:
-                                skipped +=1
-                                if verbose>1:
-                                    print('File', fyle.name, 'already exists. Overwrite not permitted. Skipping.')
-                        else:
-                            new_image.save(Path(dst_path, desired_src_structure, fyle.name if dstFileExtension == None else fyle.stem+'.'+dstFileExtension), dstFileFormat)
-            
-            # return the dict of files whether or not the user has chosen to save the files
-            return_images[fyle] = new_image
+                    up_to_date = os.stat(dst_file).st_mtime_ns >= src_stat.st_mtime_ns
+                if up_to_date:
+                    skipped +=1
+                    if verbose>1:
+                        print('File', dst_file.name, 'is up to date. Skipping.')
+                    continue
+        to_resize.append(fyle)
+        dst_files.append(dst_file)
+        to_resize_index.append(index)
+
+    # everything except the file paths is the same for each image
+    resize = functools.partial(_resize_single_image,
+        width=width, height=height, mode=mode,
+        dstFileFormat=dstFileFormat, resample=resample, reduceOnLoad=reduceOnLoad)
+
+    #    LOOK UP THE RESIZE CACHE
+    # -------------------------------------------------------------------- #
+    # only the misses are sent to be resized, the hits are read back in order in the loop below
+    # with returnOnly nothing is saved, so entries are stored losslessly (PNG), and a hit returns exactly the pixels that a miss would
+    cache_format = 'PNG' if returnOnly else dstFileFormat
+    if cacheDir is not None:
+        cache_params = (width, height, mode, cache_format, str(resample), reduceOnLoad, '.png' if returnOnly else None if dstFileExtension is None else '.'+dstFileExtension)
+        cache_files = [_resize_cache_file(cacheDir, fyle, cache_params) for fyle in to_resize]
+        is_hit = [cache_file.is_file() for cache_file in cache_files]
+    else:
+        cache_files = None
+        is_hit = [False] * len(to_resize)
+    misses = [(fyle, dst_file) for fyle, dst_file, hit in zip(to_resize, dst_files, is_hit) if not hit]
+    hits = 0
+
+    if workers > 1:
+        # results come back in the order of the input, and chunks reduce the overhead of sending single paths to the processes
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = _bounded_map(executor, resize, misses, chunkSize=max(1, min(64, len(misses) // (workers * 4))), window=workers * 2)
+    else:
+        executor = None
+        results = (resize(*args) for args in misses)
 
-    # If saving and overwriting is False
-    if overWrite==False and returnOnly==False and clearDstDir==False:
+    # loop through each image path
+    try:
+        for i, fyle in enumerate(tqdm(to_resize, ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2])):
+            if is_hit[i]:
+                try:
+                    new_image = _load_from_resize_cache(cache_files[i], dst_files[i])
+                    hits += 1
+                except OSError:
+                    # evicted by someone else since it was looked up, so resize it here after all
+                    new_image = resize(fyle, dst_files[i])
+            else:
+                new_image = next(results)
+                if cache_files is not None:
+                    _store_in_resize_cache(cache_files[i], dst_files[i], new_image, cache_format)
+            if manifest is not None and not returnOnly:
+                src_stat = os.stat(fyle)
+                manifest[str(fyle)] = [src_stat.st_size, src_stat.st_mtime_ns]
+            if checkpointPath is not None:
+                done[to_resize_index[i]] = True
+                if (i + 1) % checkpointEvery == 0:
+                    _save_resize_checkpoint(checkpointPath, signature, done)
+            # hand out the image whether or not the user has chosen to save the files
+            yield fyle, new_image
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if manifest is not None and not returnOnly:
+            _save_json_manifest(manifestPath, manifest)
+        if checkpointPath is not None:
+            if done[to_resize_index].all():
+                # the job has finished, so there is nothing left to resume
+                if Path(checkpointPath).is_file():
+                    os.remove(checkpointPath)
+            else:
+                _save_resize_checkpoint(checkpointPath, signature, done)
+        if cacheDir is not None:
+            evicted = _prune_resize_cache(cacheDir, int(cacheSizeMB * 1024**2))
+            if verbose>0:
+                print('Resize cache:', hits, 'hits,', len(to_resize) - hits, 'misses,', evicted, 'entries evicted.')
+
+    # If saving and overwriting is False (or only out of date files are resized)
+    if (overWrite==False or incremental) and returnOnly==False and clearDstDir==False:
         if verbose>0:
             print('Skipped', skipped, 'number of files, because they already existed on disk.')
 
+
+#    IMAGE RESIZER
+# -------------------------------------------------------------------- #
+def image_resize(
+    filePaths:list, 
+    width:int, height:int,
+    mode='contain',
+    dstPath='resized',
+    discardSrcLevels:int=0,
+    dstFileFormat=None,
+    dstFileExtension=None,
+    returnOnly=True,
+    clearDstDir=False,
+    overWrite=True,
+    progressBar=(80,'▢▣','#CC6655'),
+    verbose=0,
+    workers:int=1,
+    incremental:bool=False,
+    manifestPath=None,
+    resample=None,
+    reduceOnLoad:bool=True,
+    cacheDir=None,
+    cacheSizeMB:float=1024,
+    checkpointPath=None,
+    checkpointEvery:int=1000,
+    returnPaths:bool=False,
+    callback=None
+    ):
+
+    """
+    
+    ARGUMENTS:
+    
+      filePaths (list, required): A list of paths of files meant to be resized. Files will not be modified in any way.
+
+      width (int, one of width or height is required) Target width of the image in pixels. If set to auto, utilizes the provided height parameter and sets a width that maintains the aspect ratio of the image.
+
+      height (int, one of width or height is required) Target height of the image in pixels. If set to auto, utilizes the provided width parameter and sets a height that maintains the aspect ratio of the image.
+
+      mode (string, optional): Choose among 'fit' or 'contain'. Please see the documentation for Pillow's ImageOps module for details on these methods. In short, fit will resize and crop the image from the center in order to fit the image within the given width AND height while maintaining the aspect ratio. And, contain will resize the image within the given width or height, depending on which dimension keeps to maintain the aspect ratio intact. Default is 'contain'.
+      
+      dstPath (string, optional): Let's you choose the destination folder for the resized images. If 'source', then files are saved in their respective original source folder(s). If any thing other than 'source' is provided, then all the resized files will be saved to the specified folder (path). In this scenario, the directory structure of the input files is maintained within the specified destination folder. If the user is aware that the input file paths have a common root upto a certain level, then the user can specify the parameter 'discardSrcLevels' to discard a certain number of levels while replicating the dir structure of the input file paths. Default dstPath is 'resized', which means that a folder of this name will be created in the directory this script is running from and the files be stored within.
+
+      discardSrcLevels (int, optional): Applicable only when a dstPath other than 'source' is specified. If the user is aware that the input file paths have a common root upto a certain level, then the user can specify a velue to this parameter to discard a certain number of levels while replicating the dir structure of the input file paths. For example, if the input file path is '../a/b/c/d/e/image.png' and the user knows that they only want to replicate the source dirs from 'd' onwards, since the paths up to '../a/b/c/' are common, then the user should specify discardSrcLevels = 3. The default value is 0, which means the entire source path (excluding the ..s) will be replicated. 
+
+      dstFileFormat (string, optional): Specifies the format of the saved file as per the PIL library. If no format is provided, PIL tries to detect the format from the filename extension. Default is None, which means that the format will be detected from the input image.
+
+      dstFileExtension (string, optional): Specifies the extension of the saved file. If no extension is provided, files extension will be used. Default is None.
+
+      returnOnly (boolean, optional): Gives the user the option to also save the files to disk (False) in addition to returning the images as a PIL image object. Default is True, which means that images will only be returned by the function and not actually saved to the disk.
+
+      clearDstDir (boolean, optional): Applicable only to the case where dstPath != 'source'. If True, it deletes the specified destination folder and everything within it before re-creating it and copying files to it. Note that this does not work when the destination directories are the source folders themselves (consider it a pending feature). Default is True.
+
+      overWrite (boolean, optional): Applicable when the returnOnly parameter is set to False. If True, files with the same name will be overwritten. If False, files with the same name will be skipped. Skipped files are not opened at all, and are therefore not part of the returned dict.
+
+      progressBar (tuple, optional): Specifies the formatting and size of the tqdm progress bar. Specify the tuple as (length of bar expressed as columns : int, ascii characters to form the bar : character sequence as string, color : color). Default is (80,'▢▣','#CC6655').
+
+      verbose (boolean, optional): Allows user to specify the verbosity of logging prints on screen. Default is 0 (minimum verbosity).
+
+      workers (int, optional): Number of processes that decode, resize and encode the images in parallel. With more than 1, the files are spread across a process pool (the resized images are sent back to this process and returned in the same order as filePaths). All the other options behave the same. On Windows, the calling script needs the usual if __name__ == '__main__': guard. Default is 1 (no process pool).
+
+      incremental (boolean, optional): Applicable when the returnOnly parameter is set to False. If True, destination files that are up to date are skipped without opening the source image, and only new or changed sources are resized. Without a manifest, a destination is up to date if it exists and is not older than its source. With a manifest (see manifestPath), it is up to date if it exists and the size and modification time of its source match the ones recorded when it was written. Re-running a resize job over a mostly processed dataset then only costs a few stat calls per file. Skipped files are not part of the returned dict. Default is False.
+
+      manifestPath (string or Path, optional): Path to a JSON manifest recording, for every resized file, the size and modification time of its source. It is updated at the end of every run and used by incremental mode. Default is None.
+
+      resample (optional): The resampling filter used for the final resize, either a Pillow filter (e.g. PIL.Image.Resampling.LANCZOS) or one of the names 'nearest', 'box', 'bilinear', 'hamming', 'bicubic' or 'lanczos'. Faster filters trade some quality for speed. Default is None, which is Pillow's default (bicubic).
+
+      reduceOnLoad (boolean, optional): If True, large images are first shrunk by the largest power of two that keeps them at or above the target size (JPEGs are decoded directly at that scale), before the final resampling. This cuts the time per image several-fold when downscaling large photos to small sizes, at a small cost in quality. Set to False to resample from the full resolution image. Default is True.
+
+      cacheDir (str or Path, optional): A folder for a cache of resized images that can be shared between runs (and users). Entries are keyed by the source file (path, size and modification time) and by width, height, mode, format, extension, resample and reduceOnLoad. An image found in the cache is copied to its destination (or returned) without being decoded or resized again. With returnOnly, entries are stored as PNG, so that a cached image has exactly the same pixels as a freshly resized one. Default is None (no cache).
+
+      cacheSizeMB (float, optional): Size limit of the cache in MB. After each run, the least recently used entries are deleted until the cache is within the limit. Default is 1024.
+
+      checkpointPath (str or Path, optional): A checkpoint file that makes the job resumable. Every checkpointEvery files (and when the job stops, for whatever reason) the files that are done so far are recorded in it, and if the job is started again with the same file list and settings, those files are skipped. It is deleted once the job has finished. A resumed job doesn't clear the destination again (clearDstDir), so the files that are already done keep their outputs. Only used when returnOnly is False. Default is None.
+
+      checkpointEvery (int, optional): Number of files between checkpoint writes. Default is 1000.
+
+      returnPaths (boolean, optional): If True, the resized images are not kept in memory (each one is dropped as soon as it has been saved and passed to the callback, if any) and the returned dict holds the path of the saved file (None if returnOnly is True) for each source path instead. Use it, or iter_image_resize, for datasets that don't fit in memory. Default is False.
+
+      callback (function, optional): A function called with (source path, resized PIL image) for each image as soon as it has been resized (and saved). Default is None.
+
+    RETURNS:
+    A dict with the source paths (Path objects) as keys and the resized PIL images as values (or the destination paths if returnPaths is True). Returns None if the arguments are invalid.
+
+    TO DO:
+    - currently, unable to clear 'resized' directory if user chooses destination as 'source' folder. This is because the logic is a tad bit complicated as noted in the comments.
+
+    """
+
+
+    # Make sure that the source file paths are coming in as list and the mode is valid
+    if not _image_resize_args_ok(filePaths, mode, returnOnly, checkpointPath):
+        return None
+
+    return_images = {} # key can correspond to the original image path
+
+    resized = iter_image_resize(
+        filePaths, width, height, mode=mode, dstPath=dstPath, discardSrcLevels=discardSrcLevels,
+        dstFileFormat=dstFileFormat, dstFileExtension=dstFileExtension, returnOnly=returnOnly,
+        clearDstDir=clearDstDir, overWrite=overWrite, incremental=incremental, manifestPath=manifestPath,
+        progressBar=progressBar, workers=workers, verbose=verbose, resample=resample, reduceOnLoad=reduceOnLoad,
+        cacheDir=cacheDir, cacheSizeMB=cacheSizeMB, checkpointPath=checkpointPath, checkpointEvery=checkpointEvery)
+
+    for fyle, new_image in resized:
+        if callback is not None:
+            callback(fyle, new_image)
+        if returnPaths:
+            # keep only where the file went, the image itself is dropped here
+            return_images[fyle] = None if returnOnly else _resized_dst_file(fyle, dstPath, discardSrcLevels, dstFileExtension)
+        else:
+            # return the dict of files whether or not the user has chosen to save the files
+            return_images[fyle] = new_image
+
     return return_images
 
 
+#    IMAGE RESIZER INTO AN ARRAY
+# -------------------------------------------------------------------- #
+# PIL image mode for each number of channels
+_CHANNEL_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+
+def _resized_pixels(fyle:Path, width:int, height:int, mode:str, channels:int, resample, reduceOnLoad:bool) -> np.ndarray:
+    """
+    Resizes a single image and returns its pixels as a uint8 array of shape (height, width, channels), where the size is the actual size of the resized image (smaller than width x height on one side in contain mode).
+    """
+    new_image = _resize_single_image(fyle, None, width, height, mode, None, resample=resample, reduceOnLoad=reduceOnLoad)
+    if new_image.mode != _CHANNEL_MODES[channels]:
+        new_image = new_image.convert(_CHANNEL_MODES[channels])
+    return np.asarray(new_image).reshape(new_image.height, new_image.width, channels)
+
+def image_resize_to_array(
+    filePaths:list,
+    width:int, height:int,
+    mode='contain',
+    channels:int=3,
+    memmapPath=None,
+    workers:int=8,
+    resample=None,
+    reduceOnLoad:bool=True,
+    progressBar=(80,'▢▣','#CC6655'),
+    verbose=0
+    ):
+
+    """
+    Resizes images straight into one preallocated uint8 array of shape (N, height, width, channels), ready to be passed to model.fit, without keeping a PIL image or a separate array per file around. Images are resized in a thread pool (Pillow releases the GIL while decoding and resampling) and each thread writes into its own slot of the array.
+
+    ARGUMENTS:
+      filePaths (list): A list of image paths (str or Path), or a PathTable.
+
+      width, height (int): Size of the images in the array.
+
+      mode (str, optional): 'fit' crops the images to fill width x height. 'contain' fits the images inside width x height, keeps their aspect ratio, and pads the rest with zeros (the image is centered). Default is 'contain'.
+
+      channels (int, optional): 1 (grayscale), 3 (RGB) or 4 (RGBA). Images are converted as needed. Default is 3.
+
+      memmapPath (str or Path, optional): If given, the array is a memory mapped .npy file at this path (created with np.lib.format.open_memmap, so it can be opened again later with np.load(memmapPath, mmap_mode='r')) instead of an array in memory. Use it for datasets that don't fit in memory. Default is None.
+
+      workers (int, optional): Number of threads. Default is 8.
+
+      resample, reduceOnLoad (optional): As in image_resize.
+
+      progressBar (tuple, optional): Progress bar settings (ncols, ascii, colour). Default is (80,'▢▣','#CC6655').
+
+      verbose (int, optional): Verbosity of prints. Default is 0.
+
+    RETURNS:
+    (array, paths), where array is the uint8 array (or np.memmap) and paths is the list of source paths (Path objects) in the same order as the first axis of the array. Returns None if the arguments are invalid.
+
+    """
+
+    if isinstance(filePaths, PathTable):
+        filePaths = list(filePaths)
+    if not _image_resize_args_ok(filePaths, mode):
+        return None
+    if channels not in _CHANNEL_MODES:
+        print('ERROR: channels must be 1, 3 or 4. Function exiting.')
+        return None
+    file_paths = [Path(item) for item in filePaths]
+    shape = (len(file_paths), height, width, channels)
+
+    if memmapPath is not None:
+        if Path(memmapPath).parent.is_dir()==False:
+            os.makedirs(Path(memmapPath).parent)
+        array = np.lib.format.open_memmap(memmapPath, mode='w+', dtype=np.uint8, shape=shape)
+    else:
+        array = np.zeros(shape, dtype=np.uint8)
+    if verbose>0:
+        print('Resizing', len(file_paths), 'images into an array of shape', shape, '(' + friendly_size(array.nbytes) + ')')
+
+    def resize_into(i):
+        pixels = _resized_pixels(file_paths[i], width, height, mode, channels, resample, reduceOnLoad)
+        # contain leaves one side smaller than the slot, so the image is centered in it (fit fills it exactly)
+        top = (height - pixels.shape[0]) // 2
+        left = (width - pixels.shape[1]) // 2
+        array[i, top:top+pixels.shape[0], left:left+pixels.shape[1]] = pixels
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for _ in tqdm(executor.map(resize_into, range(len(file_paths))), total=len(file_paths), ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2]):
+            pass
+
+    if memmapPath is not None:
+        array.flush()
+
+    return array, file_paths
+
+
+#    PACKED IMAGE STORE
+# -------------------------------------------------------------------- #
+def pack_images(
+    filePaths:list,
+    storePath,
+    width:int, height:int,
+    mode='fit',
+    channels:int=3,
+    layout=None,
+    workers:int=8,
+    resample=None,
+    reduceOnLoad:bool=True,
+    progressBar=(80,'▢▣','#CC6655'),
+    verbose=0
+    ):
+
+    """
+    Resizes images and packs them all into one store folder instead of one file per image, so that later epochs read from a single sequential (and page cached) file without opening and stat-ing every image. Read it back with PackedImageStore.
+
+    The store folder holds a store.json (layout, channels, number of images and the source paths) and either:
+      - images.npy: a memory mappable (N, height, width, channels) uint8 array ('fixed' layout), or
+      - images.bin and index.npy: the raw uint8 pixels of the images one after the other, and the byte offset, height and width of each one ('records' layout), for images of different sizes.
+    store.json is written last, so a store without it is incomplete.
+
+    ARGUMENTS:
+      filePaths (list): A list of image paths (str or Path), or a PathTable.
+
+      storePath (str or Path): The store folder. It is created if it doesn't exist, and an existing store in it is replaced.
+
+      width, height (int): Size of the resized images (the maximum size in contain mode).
+
+      mode (str, optional): 'fit' or 'contain', as in image_resize. Default is 'fit'.
+
+      channels (int, optional): 1, 3 or 4. Default is 3.
+
+      layout (str, optional): 'fixed' or 'records'. Default is None, which is 'fixed' for fit mode and 'records' for contain mode (a fixed layout in contain mode pads the images, as in image_resize_to_array).
+
+      workers, resample, reduceOnLoad, progressBar, verbose (optional): As in image_resize_to_array.
+
+    RETURNS:
+    A PackedImageStore opened on the new store, or None if the arguments are invalid.
+
+    """
+
+    if isinstance(filePaths, PathTable):
+        filePaths = list(filePaths)
+    if not _image_resize_args_ok(filePaths, mode):
+        return None
+    if channels not in _CHANNEL_MODES:
+        print('ERROR: channels must be 1, 3 or 4. Function exiting.')
+        return None
+    if layout is None:
+        layout = 'fixed' if mode=='fit' else 'records'
+    if layout not in ['fixed', 'records']:
+        print('ERROR: Invalid layout specified. Function exiting.')
+        return None
+    file_paths = [Path(item) for item in filePaths]
+
+    store_path = Path(storePath)
+    os.makedirs(store_path, exist_ok=True)
+    # an old store.json would describe the old data, so it goes first
+    for name in ['store.json', 'images.npy', 'images.bin', 'index.npy']:
+        if Path(store_path, name).is_file():
+            os.remove(Path(store_path, name))
+
+    if layout == 'fixed':
+        image_resize_to_array(file_paths, width, height, mode=mode, channels=channels, memmapPath=Path(store_path, 'images.npy'), workers=workers, resample=resample, reduceOnLoad=reduceOnLoad, progressBar=progressBar, verbose=verbose)
+    else:
+        index = np.zeros(len(file_paths), dtype=[('offset', np.int64), ('height', np.int32), ('width', np.int32)])
+        resize = functools.partial(_resized_pixels, width=width, height=height, mode=mode, channels=channels, resample=resample, reduceOnLoad=reduceOnLoad)
+        offset = 0
+        # records are written in order as they come back from the threads, with only a few images in flight at a time
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor, open(Path(store_path, 'images.bin'), 'wb') as records:
+            results = _bounded_map(executor, resize, [(fyle,) for fyle in file_paths], chunkSize=8, window=max(1, workers) * 2)
+            for i, pixels in enumerate(tqdm(results, total=len(file_paths), ncols=progressBar[0], ascii=progressBar[1], colour=progressBar[2])):
+                index[i] = (offset, pixels.shape[0], pixels.shape[1])
+                records.write(pixels.tobytes())
+                offset += pixels.nbytes
+        np.save(Path(store_path, 'index.npy'), index)
+
+    _save_json_manifest(Path(store_path, 'store.json'), {
+        'format_version': 1,
+        'layout': layout,
+        'channels': channels,
+        'count': len(file_paths),
+        'paths': [str(fyle) for fyle in file_paths],
+    })
+    if verbose>0:
+        print('Packed', len(file_paths), 'images into', store_path)
+
+    return PackedImageStore(store_path)
+
+class PackedImageStore(Sequence):
+    """
+    Reads a store written by pack_images. The images are memory mapped, so indexing returns NumPy views into the page cache without copying anything, and only the pages that are actually touched are read from disk.
+
+    store[i] returns the (height, width, channels) uint8 array of image i. With the 'fixed' layout, store[start:stop] (or store.array[start:stop]) returns a single (n, height, width, channels) view that can be passed to model.fit as is. With the 'records' layout, store[start:stop] returns a list of views, one per image, all backed by one contiguous range of the file. store.paths holds the source path of each image, in the same order.
+
+    For example:
+
+        store = pv.core.pack_images(paths, 'train_store', 224, 224)
+        store = pv.core.PackedImageStore('train_store')   # later, e.g. in another process
+        batch = store[0:32]
+
+    """
+
+    def __init__(self, storePath):
+        self.path = Path(storePath)
+        meta = _load_json_manifest(Path(self.path, 'store.json'))
+        if not meta:
+            raise FileNotFoundError('No complete packed image store in ' + str(self.path))
+        self.layout = meta['layout']
+        self.channels = meta['channels']
+        self.paths = [Path(item) for item in meta['paths']]
+        if self.layout == 'fixed':
+            self._images = np.load(Path(self.path, 'images.npy'), mmap_mode='r')
+            self._index = None
+        else:
+            self._index = np.load(Path(self.path, 'index.npy'))
+            if Path(self.path, 'images.bin').stat().st_size:
+                self._images = np.memmap(Path(self.path, 'images.bin'), dtype=np.uint8, mode='r')
+            else:
+                # np.memmap can't map an empty file
+                self._images = np.zeros(0, dtype=np.uint8)
+
+    @property
+    def array(self) -> np.ndarray:
+        """The whole (N, height, width, channels) memory mapped array ('fixed' layout only)."""
+        if self.layout != 'fixed':
+            raise TypeError("Only a store with the 'fixed' layout is a single array")
+        return self._images
+
+    @property
+    def shapes(self) -> np.ndarray:
+        """An (N, 3) array with the shape of each image."""
+        if self.layout == 'fixed':
+            return np.tile(self._images.shape[1:], (len(self), 1))
+        return np.stack([self._index['height'], self._index['width'], np.full(len(self), self.channels)], axis=1)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _record(self, i:int) -> np.ndarray:
+        offset, height, width = self._index[i]
+        return self._images[offset:offset + height*width*self.channels].reshape(height, width, self.channels)
+
+    def __getitem__(self, key):
+        if self.layout == 'fixed':
+            return self._images[key]
+        if isinstance(key, slice):
+            return [self._record(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('PackedImageStore index out of range')
+        return self._record(key)
+
+    def __repr__(self):
+        return 'PackedImageStore(' + repr(str(self.path)) + ', layout=' + repr(self.layout) + ', ' + str(len(self)) + ' images)'
+
+
+#    BATCH AUGMENTATION
+# -------------------------------------------------------------------- #
+# Each transform below returns a function (batch, rng) -> batch that works on a whole uint8 batch of shape (N, height, width, channels) at once with NumPy, drawing one set of random parameters per image from the NumPy Generator rng. They are chained with AugmentationPipeline.
+
+def random_flip(horizontal:bool=True, vertical:bool=False, p:float=0.5):
+    """
+    Flips each image left-right (and/or upside down) with probability p.
+    """
+    def flip(batch, rng):
+        batch = batch.copy()
+        if horizontal:
+            mask = rng.random(len(batch)) < p
+            batch[mask] = batch[mask, :, ::-1]
+        if vertical:
+            mask = rng.random(len(batch)) < p
+            batch[mask] = batch[mask, ::-1]
+        return batch
+    return flip
+
+def random_crop(height:int, width:int, padding:int=0):
+    """
+    Crops a randomly placed height x width window out of each image, after padding the images with `padding` zeros on every side.
+    """
+    def crop(batch, rng):
+        if padding:
+            batch = np.pad(batch, ((0, 0), (padding, padding), (padding, padding), (0, 0)))
+        n = len(batch)
+        tops = rng.integers(0, batch.shape[1] - height + 1, size=n)
+        lefts = rng.integers(0, batch.shape[2] - width + 1, size=n)
+        # one fancy index gathers every window of the batch in a single pass
+        rows = tops[:, None] + np.arange(height)
+        cols = lefts[:, None] + np.arange(width)
+        return batch[np.arange(n)[:, None, None], rows[:, :, None], cols[:, None, :]]
+    return crop
+
+def random_rotation(maxDegrees:float):
+    """
+    Rotates each image about its center by an angle drawn uniformly from [-maxDegrees, maxDegrees], with nearest neighbour sampling. Corners that come from outside the image are filled with zeros.
+    """
+    def rotate(batch, rng):
+        n, height, width = batch.shape[:3]
+        angles = np.deg2rad(rng.uniform(-maxDegrees, maxDegrees, size=n)).astype(np.float32)
+        cos, sin = np.cos(angles)[:, None, None], np.sin(angles)[:, None, None]
+        y = np.arange(height, dtype=np.float32)[None, :, None] - (height - 1) / 2
+        x = np.arange(width, dtype=np.float32)[None, None, :] - (width - 1) / 2
+        # for every output pixel, the source pixel it comes from (the inverse rotation)
+        src_y = np.rint(cos * y - sin * x + (height - 1) / 2).astype(np.intp)
+        src_x = np.rint(sin * y + cos * x + (width - 1) / 2).astype(np.intp)
+        inside = (src_y >= 0) & (src_y < height) & (src_x >= 0) & (src_x < width)
+        rotated = batch[np.arange(n)[:, None, None], np.clip(src_y, 0, height - 1), np.clip(src_x, 0, width - 1)]
+        rotated[~inside] = 0
+        return rotated
+    return rotate
+
+def color_jitter(brightness:float=0, contrast:float=0, saturation:float=0):
+    """
+    Scales the brightness, contrast and saturation of each image by factors drawn uniformly from [1 - value, 1 + value]. Saturation is only changed for images with 3 or more channels.
+    """
+    def jitter(batch, rng):
+        n = len(batch)
+        out = batch.astype(np.float32)
+        if brightness:
+            out *= rng.uniform(1 - brightness, 1 + brightness, size=n).astype(np.float32)[:, None, None, None]
+        if contrast:
+            means = out[..., :3].mean(axis=(1, 2, 3), keepdims=True)
+            factors = rng.uniform(1 - contrast, 1 + contrast, size=n).astype(np.float32)[:, None, None, None]
+            out[..., :3] = (out[..., :3] - means) * factors + means
+        if saturation and batch.shape[3] >= 3:
+            gray = out[..., :3].mean(axis=3, keepdims=True)
+            factors = rng.uniform(1 - saturation, 1 + saturation, size=n).astype(np.float32)[:, None, None, None]
+            out[..., :3] = (out[..., :3] - gray) * factors + gray
+        return np.clip(out, 0, 255, out=out).astype(np.uint8)
+    return jitter
+
+class AugmentationPipeline:
+    """
+    Chains batch transforms (random_flip, random_crop, random_rotation, color_jitter or any function (batch, rng) -> batch) and applies them to NumPy batches.
+
+    The random numbers for a batch come from a generator seeded with (seed, epoch, batchIndex) through np.random.SeedSequence, so a batch gets the same augmentation every time it is run with the same seed, epoch and index, no matter which thread runs it or in which order. Leave seed as None for different augmentations on every run.
+
+    For example:
+
+        pipeline = pv.core.AugmentationPipeline([pv.core.random_flip(), pv.core.random_crop(200, 200, padding=8), pv.core.color_jitter(0.2, 0.2, 0.2)], seed=42)
+        for images, labels in pv.core.iter_augmented_batches(store, 32, pipeline, labels=labels, epoch=epoch):
+            model.train_on_batch(images, labels)
+
+    """
+
+    def __init__(self, transforms:list, seed=None):
+        self.transforms = list(transforms)
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+
+    def rng(self, batchIndex:int=0, epoch:int=0) -> np.random.Generator:
+        """The random generator used for the given batch of the given epoch."""
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(epoch, batchIndex)))
+
+    def __call__(self, batch, batchIndex:int=0, epoch:int=0) -> np.ndarray:
+        rng = self.rng(batchIndex, epoch)
+        batch = np.asarray(batch)
+        for transform in self.transforms:
+            batch = transform(batch, rng)
+        return batch
+
+def iter_augmented_batches(images, batchSize:int, pipeline=None, labels=None, shuffle:bool=True, seed=None, epoch:int=0, workers:int=4, prefetch:int=2, dropLast:bool=False):
+    """
+    Yields augmented batches of images, prepared ahead of time by a thread pool so that they are ready before the model asks for them. NumPy releases the GIL for the heavy work, so the threads run in parallel.
+
+    ARGUMENTS:
+      images: A (N, height, width, channels) uint8 array or np.memmap (e.g. from image_resize_to_array), or a PackedImageStore with the 'fixed' layout.
+
+      batchSize (int): Number of images per batch.
+
+      pipeline (AugmentationPipeline, optional): Applied to each batch. Default is None (no augmentation).
+
+      labels (array-like, optional): Labels of the images. If given, (images, labels) tuples are yielded. Default is None.
+
+      shuffle (boolean, optional): Shuffle the order of the images for each epoch. Default is True.
+
+      seed (int, optional): Seed of the shuffling, which is also combined with epoch so that each epoch gets its own order. Default is None (random).
+
+      epoch (int, optional): Epoch number, which changes the order and the augmentation of each epoch. Default is 0.
+
+      workers (int, optional): Number of threads. Default is 4.
+
+      prefetch (int, optional): Number of batches per thread that are prepared ahead. Default is 2.
+
+      dropLast (boolean, optional): Drop the last batch if it is smaller than batchSize. Default is False.
+
+    RETURNS:
+    A generator of uint8 batches, or of (batch, labels) tuples.
+
+    """
+
+    if isinstance(images, PackedImageStore):
+        images = images.array
+    labels = None if labels is None else np.asarray(labels)
+    n = len(images)
+    order = np.random.default_rng([seed, epoch] if seed is not None else None).permutation(n) if shuffle else np.arange(n)
+    stop = n - n % batchSize if dropLast else n
+
+    def make_batch(batchIndex):
+        # sorted indices read a memory mapped array front to back
+        indices = np.sort(order[batchIndex*batchSize : min((batchIndex+1)*batchSize, stop)])
+        batch = np.asarray(images[indices])
+        if pipeline is not None:
+            batch = pipeline(batch, batchIndex, epoch)
+        return batch if labels is None else (batch, labels[indices])
+
+    batch_indices = [(i,) for i in range(math.ceil(stop / batchSize))]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        yield from _bounded_map(executor, make_batch, batch_indices, chunkSize=1, window=max(1, workers) * max(1, prefetch))
+
+
 #
 # ============================================================================ #
 #
@@ -13,8 +13,9 @@
 # ============================================================================ #
 
 import os
-import random
 import shutil
+import json
+import hashlib
 from pathlib import Path
 import pvnrt as pv
 from datetime import datetime
@@ -43,10 +44,7 @@ VALID_PARAMS = [
     # DATA
     'DATA_FILE_PATH', # full path; name and ext can be derived from this
     'DATA_FILE_PATHS', # list of full paths
-<<<<<<< Updated upstream
-=======
     'TVT_RATIO', # tuple of (train, val, test) ratios
->>>>>>> Stashed changes
     # MODEL
     'MODEL_SUMMARY', # string
     'MODEL_ARCH_FILE_PATH',
@@ -117,7 +115,7 @@ VALID_PARAMS = [
 
 class Experiment:
 
-    def __init__(self, studiesPath:Path, studyID:str, expID:str='', lenExpID:int=3, expIDPrefix:str='', validParams:list=VALID_PARAMS):
+    def __init__(self, studiesPath:Path, studyID:str, expID:str='', lenExpID:int=3, expIDPrefix:str='', validParams:list=VALID_PARAMS, idCounterFile:str='.next_id'):
 
         '''
         A class to manage a computational experiment (within a study), primarily managing a report.txt Requires at least a study id, and a study folder path to initialize.
@@ -138,6 +136,8 @@ class Experiment:
 
           expIDPrefix (str, optional): the prefix at the start the name of the experiment id, and therefore, folder. Should match with prefixes of any existing folders.
 
+          idCounterFile (str, optional): name of the counter file kept inside the study folder to hand out new experiment ids without scanning all experiment folders, and without two experiments created at the same time getting the same id. See pvnrt.core.get_next_id() for details. If experiment folders are created by hand, delete this file so that it is rebuilt from a scan. Pass None to always scan the study folder. Default is '.next_id'.
+
         '''
 
         self.STUDIES_PATH = Path(studiesPath)
@@ -146,6 +146,7 @@ class Experiment:
         self.LEN_EXP_ID = lenExpID
         self.EXP_ID_PREFIX = expIDPrefix
         self.VALID_PARAMS = validParams
+        self.ID_COUNTER_FILE = idCounterFile
 
         # find a path to the study folder based on the study id provided
         self.STUDY_PATH = pv.core.get_paths(self.STUDIES_PATH, self.STUDY_ID + '*')[0] # throws an error if no match is found
@@ -158,7 +159,8 @@ class Experiment:
             self.EXP_ID = pv.core.get_next_id(self.STUDY_PATH, 
                             lenID=self.LEN_EXP_ID, 
                             removePrefix=self.EXP_ID_PREFIX, 
-                            fileOrDir='dir')
+                            fileOrDir='dir',
+                            counterFile=self.ID_COUNTER_FILE)
             # create a new experiment folder
             self.EXP_PATH = Path(self.STUDY_PATH, self.EXP_ID_PREFIX + str(self.EXP_ID) + ' ' + self._exp_folder_name)
             self.EXP_PATH.mkdir()
@@ -299,13 +301,239 @@ class Experiment:
 # ============================================================================ #
 
 
+#    SPLITTING ENGINE
+# ============================================================================ #
+
+def _interpret_tvt_ratio(tvtRatio, verbose:int=0):
+    """
+    Interprets the tvtRatio argument of the splitters (see dataset_splitting_subFolderIsClass for the accepted forms) and returns it as a list of 2 or 3 floats, or None (after printing an error) if it is invalid.
+    """
+
+    # Convert ratio to a list if a single value is passed
+    if type(tvtRatio) is not list:
+        tvtRatio = [tvtRatio]
+    # makes sure the ratios passed are floating point numbers
+    tvtRatio = [float(item) for item in tvtRatio]
+    
+    # A user can pass 1, 2, 3 or more (erroneously) values in the ratio. Process accordingly.
+    if len(tvtRatio)==3:
+        if sum(tvtRatio)>=1:
+            # Normalize them so that their sum is 1.
+            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio] # sum = 1.0
+            if verbose>0:
+                print('3 ratios provided, interpreted as', tvtRatio)
+        else:
+            # IMPORTANT: if sum of the ratios is less than 1, then and only then, interpret them as subsampling (not utilizing all images). In this case tvtRatio should be left unchanged.
+            if verbose>0:
+                print('3 ratios provided, interpreted as', tvtRatio, 'do not add up to 1. Assuming subsampling (not utilizing all images in the source) is intended, only the displayed fraction of images will be randomly sampled.')
+
+    elif len(tvtRatio)==2:
+        # this can mean two things - user does not want a test set unless the sum of the ratios is less than one. If the sum is more than 1, then normalize the set. For example, if ratio is 8:5, normalize it to [8/13:5/13] and assume that they don't want a test set.
+        if sum(tvtRatio)>=1:
+            # No test set will be generated
+            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio]
+            if verbose>0:
+                print('Two ratios provided, with sum greater than or equal to 1. Assuming no test set is required. Will create training and validation set in the given ratio, normalized to', tvtRatio)
+        else:
+            if verbose>0:
+                print('Two ratios provided, with sum less than 1. Test set will also be created with the remainder items.')
+    elif len(tvtRatio)==1:
+        # this definitely means no test set is desired. If the element is less than 1, then it is assumed that a validation set is desired, else it is assumed that it is not.
+        if tvtRatio[0]>=1:
+            # set the list to [1, 0] so that no validation or test data is created.
+            tvtRatio = [1, 0]
+            if verbose>0:
+                print('Only one ratio, greater than or equal to 1, provided. Weird input, but okay! No validation or training set will be generated.')
+        else:
+            # create a validation ratio (remainder), our code needs a second ratio
+            tvtRatio = [tvtRatio[0], 1-tvtRatio[0]]
+            if verbose>0:
+                print('Only one ratio, less than 1, provided. Validation set will be generated from the remainder items.')
+    else:
+        print('Invalid validation ratios. Function exiting.')
+        return None
+
+    return tvtRatio
+
+def _split_indices(n:int, tvtRatio:list, seed=None) -> list:
+    """
+    Splits range(n) into training, validation and test index arrays for an interpreted tvtRatio (see _interpret_tvt_ratio), with the same semantics as the splitters: int(ratio*n) items for training and validation, and either int(ratio*n) items for testing (3 ratios adding up to at most 1, i.e. subsampling) or all the remaining items. The indices are permuted once with a NumPy Generator and sliced, so it takes linear time and never compares paths. seed can be a seed or a Generator (used to split several classes one after another with one generator).
+    """
+    permutation = np.random.default_rng(seed).permutation(n)
+    n_train = int(tvtRatio[0]*n)
+    n_val = int(tvtRatio[1]*n)
+    if len(tvtRatio)==3 and sum(tvtRatio)<=1:
+        n_test = int(tvtRatio[2]*n)
+    else:
+        # the third ratio (if any) is not used, all the remaining items are assigned to the test set
+        n_test = n - n_train - n_val
+    return [permutation[:n_train], permutation[n_train:n_train+n_val], permutation[n_train+n_val:n_train+n_val+n_test]]
+
+def _path_part(parts:tuple, level:int) -> str:
+    return parts[level] if -len(parts) <= level < len(parts) else ''
+
+def path_group_keys(paths, level:int) -> np.ndarray:
+    """
+    Returns an array with one grouping key per path: the path part at the given level (as in Path(path).parts[level]), e.g. -2 for the parent folder (a subject or session folder, or the folder name that paths_to_tvt puts in front of the destination names) or 1 for the second folder from the top. Paths without such a level get the key ''. For a pvnrt.core.PathTable, each unique directory is only looked at once.
+    """
+    if isinstance(paths, pv.core.PathTable) and level != -1:
+        # the parts of a path are the parts of its directory plus the file name
+        dir_level = level + 1 if level < 0 else level
+        dir_keys = np.array([_path_part(Path(item).parts, dir_level) for item in paths.dirs] or [''])
+        return dir_keys[paths.dir_ids]
+    return np.array([_path_part(Path(item).parts, level) for item in paths] or [''])[:len(paths)]
+
+def stratified_split(labels, tvtRatio, seed=None, groups=None, verbose:int=0) -> np.ndarray:
+    """
+    Vectorised train/val/test split that is stratified on one or more label columns and, optionally, keeps groups of related rows together.
+
+    Each stratum (unique combination of labels) is split on its own in the given ratio, with the same ratio semantics as the splitters (see dataset_splitting_subFolderIsClass, including subsampling). With groups, whole groups are assigned: they are put in a random order within their stratum and each group goes to the split in whose share of rows it starts, so the ratios hold in rows up to the size of one group. A group belongs to the stratum of its first row. Everything is done with NumPy sorting and counting, with no Python loop over rows, so millions of rows take seconds.
+
+    ARGUMENTS:
+      labels (array-like): Shape (n,) or (n, k) for k label columns (e.g. class and site).
+
+      tvtRatio (float or list): As in the splitters.
+
+      seed (number or Generator, optional): Seed of the random order. Default is None.
+
+      groups (array-like, optional): Shape (n,), a key per row (e.g. from path_group_keys); rows with the same key always end up in the same split. Default is None.
+
+    RETURNS:
+    An int8 array with the split of each row: 0 train, 1 val, 2 test, -1 not sampled. Returns None if the ratio is invalid.
+
+    """
+    tvtRatio = _interpret_tvt_ratio(tvtRatio, verbose)
+    if tvtRatio is None:
+        return None
+    labels = np.asarray(labels)
+    n = len(labels)
+    if n == 0:
+        return np.zeros(0, dtype=np.int8)
+    if labels.ndim == 1:
+        labels = labels[:, None]
+    # each label column is coded as integers first, so that any kind of labels (strings, numbers) can be combined into strata
+    codes = np.stack([np.unique(labels[:, j], return_inverse=True)[1].reshape(-1) for j in range(labels.shape[1])], axis=1)
+    strata = np.unique(codes, axis=0, return_inverse=True)[1].reshape(-1)
+
+    # the units that are assigned are the groups, or the single rows
+    if groups is None:
+        units, first_rows = np.arange(n), np.arange(n)
+    else:
+        _, first_rows, units = np.unique(np.asarray(groups), return_index=True, return_inverse=True)
+        units = units.reshape(-1)
+    unit_sizes = np.bincount(units, minlength=len(first_rows))
+    unit_strata = strata[first_rows]
+
+    # random order of the units within each stratum
+    order = np.lexsort((np.random.default_rng(seed).random(len(first_rows)), unit_strata))
+    sorted_sizes = unit_sizes[order]
+    sorted_strata = unit_strata[order]
+    stratum_rows = np.bincount(unit_strata, weights=unit_sizes).astype(np.int64)
+    stratum_starts = np.cumsum(stratum_rows) - stratum_rows
+    # number of rows of the stratum that come before each unit
+    rows_before = np.cumsum(sorted_sizes) - sorted_sizes - stratum_starts[sorted_strata]
+
+    # split sizes in rows, per stratum (int() of ratio*rows, as in _split_indices)
+    rows = stratum_rows[sorted_strata]
+    n_train = (tvtRatio[0]*rows).astype(np.int64)
+    n_val = (tvtRatio[1]*rows).astype(np.int64)
+    if len(tvtRatio)==3 and sum(tvtRatio)<=1:
+        n_test = (tvtRatio[2]*rows).astype(np.int64)
+    else:
+        n_test = rows - n_train - n_val
+    sorted_splits = np.select([rows_before < n_train, rows_before < n_train + n_val, rows_before < n_train + n_val + n_test], [0, 1, 2], -1)
+
+    unit_splits = np.empty(len(first_rows), dtype=np.int8)
+    unit_splits[order] = sorted_splits
+    return unit_splits[units]
+
+def _hash_split_thresholds(tvtRatio:list) -> tuple:
+    """
+    Upper bounds of the train, val and test shares of [0, 1) for an interpreted tvtRatio, with the same semantics as _split_indices.
+    """
+    if len(tvtRatio)==3 and sum(tvtRatio)<=1:
+        return tvtRatio[0], tvtRatio[0]+tvtRatio[1], sum(tvtRatio)
+    # the remaining items all go to the test set
+    return tvtRatio[0], tvtRatio[0]+tvtRatio[1], 1.0
+
+def _hash_split_key(path, rootPrefix:str='') -> str:
+    """
+    The key a path is hashed by: its path relative to the root (rootPrefix is the root followed by a separator, see _hash_split_root), with forward slashes so that the same file gets the same split on every OS. Plain string operations, since this runs for every file.
+    """
+    path = os.fspath(path)
+    if rootPrefix and path.startswith(rootPrefix):
+        path = path[len(rootPrefix):]
+    return path.replace(os.sep, '/') if os.sep != '/' else path
+
+def _hash_split_root(root) -> str:
+    return '' if root is None else os.path.join(os.fspath(root), '')
+
+def hash_split(key:str, thresholds:tuple, seed=None) -> int:
+    """
+    Returns the split (0 train, 1 val, 2 test, -1 not sampled) of a key, e.g. a relative path, from a stable hash of the seed and the key, mapped to a number in [0, 1) and compared to thresholds (see _hash_split_thresholds). The result only depends on the key, the seed and the ratio, never on the other files.
+    """
+    digest = hashlib.blake2b(('' if seed is None else str(seed)).encode('utf-8') + b'\0' + key.encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+    value = int.from_bytes(digest, 'big') / 2**64
+    if value < thresholds[0]:
+        return 0
+    if value < thresholds[1]:
+        return 1
+    if value < thresholds[2]:
+        return 2
+    return -1
+
+def iter_hash_split(paths, tvtRatio=[7,2,1], seed=None, root=None, groupLevel:int=None, verbose:int=0):
+    """
+    Streaming train/val/test split: yields a (path, split) tuple for each path, where split is 0 (train), 1 (val), 2 (test) or -1 (not sampled, when 3 ratios add up to less than 1). The split of a file comes from a stable hash of its path relative to root (or of its group key, see below) and the seed, so it needs no list of all files, uses constant memory, doesn't touch the global random state, and a file keeps its split when files are added to or removed from the dataset. The shares of the splits match the ratio up to random variation (about 1/sqrt(n)), not exactly as with the other splitters.
+
+    ARGUMENTS:
+      paths (iterable): Any iterable of paths, e.g. pvnrt.core.iter_filetype_search(...).
+
+      tvtRatio (float or list, optional): As in the splitters. Default is [7,2,1].
+
+      seed (optional): Changes the assignment of all files. Default is None.
+
+      root (str or Path, optional): Paths are hashed relative to root, so that the dataset can be moved. Default is None (the paths as given).
+
+      groupLevel (int, optional): If passed, the path part at this level (as in Path(path).parts[groupLevel], of the path as given, regardless of root; see path_group_keys) is hashed instead of the path, so that all files of a group land in the same split. Default is None.
+
+    EXAMPLE:
+        for path, split in pv.ml.iter_hash_split(pv.core.iter_filetype_search(SRC, ['jpg']), [8, 1, 1], seed=7, root=SRC):
+            ...
+
+    """
+    tvtRatio = _interpret_tvt_ratio(tvtRatio, verbose)
+    if tvtRatio is None:
+        return
+    yield from _iter_hash_split(paths, _hash_split_thresholds(tvtRatio), seed, _hash_split_root(root), groupLevel)
+
+def _iter_hash_split(paths, thresholds:tuple, seed, rootPrefix:str, groupLevel:int):
+    """
+    The body of iter_hash_split, for callers that have already interpreted the ratio. The group key is taken from the full path, exactly as in path_group_keys, so that groupLevel means the same with and without hashing.
+    """
+    for path in paths:
+        key = _hash_split_key(path, rootPrefix) if groupLevel is None else _path_part(Path(path).parts, groupLevel)
+        yield path, hash_split(key, thresholds, seed)
+
+def _take_items(items, indices) -> list:
+    """
+    Returns the items at the given indices, as a PathTable if items is one (without building a Path per item) and as a list otherwise.
+    """
+    if isinstance(items, pv.core.PathTable):
+        return items.take(indices)
+    return [items[i] for i in indices]
+
+
 #    SUBFOLDER IS CLASS
 # ============================================================================ #
 
 def dataset_splitting_subFolderIsClass(
     srcPath:Path, dstPath:Path=Path(), dstSubFolderName:str='splitData', clearDestination:bool=False, moveSrcFiles:bool=False, fileExtensions='', 
     tvtRatio:list=[7,2,1], seed=None, 
-    softMode:bool=True, verbose:int=0
+    softMode:bool=True, verbose:int=0,
+    excludeDuplicates:bool=False,
+    strategy:str=None, workers:int=8,
+    manifestPath=None, groupLevel:int=None, hashSplit:bool=False
     ):
 
     """
@@ -329,12 +557,24 @@ def dataset_splitting_subFolderIsClass(
 
       tvtRatio (float, list of floats or ints, optional): Splits the data in the provided ratios. Ratios such as 0.7, 12, [0.8], [0.8, 0.2], [0.8, 0.1, 0.1], [6, 3], [500, 100, 200] and so on... are all valid. In most cases, the function will correctly interpret the ratios and normalize them. Ratios such as [80, 10, 5, 5] are invalid (4 elements) and will cause the function to quit. It is possible to subsample the source files, i.e. utilize only a fraction of the entire dataset by providing 3 ratios whose sum is less than or equal to 1. 
 
-      seed (number, optional): Seed used for random sampling for images. Use the same number if it is intended to get the same TVT samples repeatedly. Default is None, which means that the sampling will be non-repeatable because random function by default uses the system time as seed.
+      seed (number, optional): Seed used for random sampling for images. Use the same number if it is intended to get the same TVT samples repeatedly. Default is None, which means that the sampling will be non-repeatable because the random generator is then seeded with fresh entropy from the operating system.
 
       softMode (boolean, optional): If this feature is turned on (True), then the function will return the usual list of T,V,T files for each class and not actually create/delete directories nor copy/move any files. This mode can be useful to use the function in a context where only the path names are needed. Default is False, which means that the function will actually copy/move files around.
 
+      excludeDuplicates (boolean, optional): If True, byte-identical copies of files are found across all classes (see pvnrt.core.find_duplicate_files) and only the first copy (in the order the classes and files are scanned) is used, so that the same image can't end up in both the training and the validation/test sets. The groups of duplicates are returned under the key 'duplicates'. Default is False.
+
+      strategy (string, optional): How the files are placed in the destination: 'copy', 'copy2', 'move', 'hardlink', 'symlink' or 'reflink' (see pvnrt.core.materialise_files). The link strategies take no extra disk space and split even very large datasets in seconds. Default is None, which means 'move' if moveSrcFiles is True and 'copy' otherwise.
+
+      workers (int, optional): Number of threads used to copy/move/link the files. Default is 8.
+
+      groupLevel (int, optional): If passed, files that share the path part at this level (as in Path(file).parts[groupLevel], e.g. -2 for the parent folder, such as one folder per subject) are kept together in the same split, across all classes (see stratified_split and path_group_keys). The split is still stratified by class. Default is None (files are split individually).
+
+      hashSplit (boolean, optional): If True, each file is assigned to a split from a stable hash of the seed and its path relative to srcPath (or of its group key, if groupLevel is passed), see iter_hash_split. A file then keeps its split when files are added to the dataset later, at the cost of split sizes that match the ratio only approximately. groupLevel picks the same path part as without hashSplit. Default is False.
+
+      manifestPath (string or Path, optional): If passed, the split is also saved to this manifest file (see write_split_manifest), from where load_split_manifest recreates it in one file read, without scanning the source again. Its content hash is returned under the key 'manifest hash'. Default is None.
+
     DEPENDS ON:
-    os, random, shutil and pathlib etc. modules.
+    os, shutil, numpy and pathlib etc. modules.
 
     RETURNS:
     List of file (pathlib Paths relative to script) for training, validation and test file-lists (in that order) for each class in the form of a dictionary with keys corresponding to the class names.
@@ -347,6 +587,11 @@ def dataset_splitting_subFolderIsClass(
 
     """
 
+    # an invalid strategy would only be noticed when the files are placed, after the destination has been cleared
+    if strategy is not None and strategy not in pv.core.MATERIALISE_STRATEGIES:
+        print('ERROR: Invalid strategy specified. Function exiting.')
+        return None
+
     # create the return dictionary
     return_dict = {}
 
@@ -385,49 +630,8 @@ def dataset_splitting_subFolderIsClass(
     # -------------------------------
     # Taking care of the ratio input
     # -------------------------------
-    
-    # Convert ratio to a list if a single value is passed
-    if type(tvtRatio) is not list:
-        tvtRatio = [tvtRatio]
-    # makes sure the ratios passed are floating point numbers
-    tvtRatio = [float(item) for item in tvtRatio]
-    
-    # A user can pass 1, 2, 3 or more (erroneously) values in the ratio. Process accordingly.
-    if len(tvtRatio)==3:
-        if sum(tvtRatio)>=1:
-            # Normalize them so that their sum is 1.
-            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio] # sum = 1.0
-            if verbose>0:
-                print('3 ratios provided, interpreted as', tvtRatio)
-        else:
-            # IMPORTANT: if sum of the ratios is less than 1, then and only then, interpret them as subsampling (not utilizing all images). In this case tvtRatio should be left unchanged.
-            if verbose>0:
-                print('3 ratios provided, interpreted as', tvtRatio, 'do not add up to 1. Assuming subsampling (not utilizing all images in the source) is intended, only the displayed fraction of images will be randomly sampled.')
-
-    elif len(tvtRatio)==2:
-        # this can mean two things - user does not want a test set unless the sum of the ratios is less than one. If the sum is more than 1, then normalize the set. For example, if ratio is 8:5, normalize it to [8/13:5/13] and assume that they don't want a test set.
-        if sum(tvtRatio)>=1:
-            # No test set will be generated
-            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio]
-            if verbose>0:
-                print('Two ratios provided, with sum greater than or equal to 1. Assuming no test set is required. Will create training and validation set in the given ratio, normalized to', tvtRatio)
-        else:
-            if verbose>0:
-                print('Two ratios provided, with sum less than 1. Test set will also be created with the remainder items.')
-    elif len(tvtRatio)==1:
-        # this definitely means no test set is desired. If the element is less than 1, then it is assumed that a validation set is desired, else it is assumed that it is not.
-        if tvtRatio[0]>=1:
-            # set the list to [1, 0] so that no validation or test data is created.
-            tvtRatio = [1, 0]
-            if verbose>0:
-                print('Only one ratio, greater than or equal to 1, provided. Weird input, but okay! No validation or training set will be generated.')
-        else:
-            # create a validation ratio (remainder), our code needs a second ratio
-            tvtRatio = [tvtRatio[0], 1-tvtRatio[0]]
-            if verbose>0:
-                print('Only one ratio, less than 1, provided. Validation set will be generated from the remainder items.')
-    else:
-        print('Invalid validation ratios. Function exiting.')
+    tvtRatio = _interpret_tvt_ratio(tvtRatio, verbose)
+    if tvtRatio is None:
         return None
 
     #    Return the interpreted ratio
@@ -437,8 +641,8 @@ def dataset_splitting_subFolderIsClass(
     # ------------------------
     # Setting seed
     # ------------------------
-    if seed:
-        random.seed(seed)
+    # a generator of its own, so that the global random state used by other code is left alone
+    rng = np.random.default_rng(seed)
 
     # -----------------------------------------
     # Split the files into tvt folders
@@ -455,27 +659,13 @@ def dataset_splitting_subFolderIsClass(
     return_dict['classes'] = classes
     
 
-    if verbose>1:
-        print('Found', len(classes), 'immediate directories in given source path. Interpreting directory names as class names. Anticipated split per class is shown below.\n')
-    # create an output table
-    if verbose>0:
-        print(''.ljust(80,'-'))
-        print('CLASS'.ljust(30)+' | '+'TRAIN'.rjust(6)+' | '+'VAL'.rjust(6)+' | '+'TEST'.rjust(6)+' | '+'SAMPLE'.rjust(6)+' | '+'TOTAL'.rjust(6))
-        print(''.ljust(80,'-'))
-
-    #    Return the output table (heading only)
-    # -------------------------------------------------------------------- #
-    return_dict['Table heading'] = 'CLASS'.ljust(30)+'\t'+'TRAIN'.rjust(6)+'\t'+'VAL'.rjust(6)+'\t'+'TEST'.rjust(6)+'\t'+'SAMPLE'.rjust(6)+'\t'+'TOTAL'.rjust(6)
-    # create a list to hold each row of the table
-    output_table = []
+    # ------------------------
+    # Build list
+    # ------------------------
 
-    # Loop through each class/subfolder
-    # ----------------------------------
+    # file list of each class, built for all classes first so that duplicates can be found across classes
+    class_files = {}
     for klass in classes:
-
-        # ------------------------
-        # Build list
-        # ------------------------
         
         # build path for the source subfolder=class
         class_path = Path(srcPath, klass)
@@ -496,22 +686,58 @@ def dataset_splitting_subFolderIsClass(
                 else:
                     filename_list.append(Path(dirPath, fyle))
 
-        # build a training set list (filenames only) in a given class
-        train_list = random.sample(filename_list, int(tvtRatio[0]*len(filename_list)))
-        # list containing items not in training set
-        notTrain_list = [item for item in filename_list if item not in train_list]
-        # build a validation set list (filenames only) in a given class
-        val_list = random.sample(notTrain_list, int(tvtRatio[1]*len(filename_list)))
-
-        # build a testing set list (filenames only) in a given class
-        #   IMPORTANT: Two cases arise here
-        if len(tvtRatio)==3 and sum(tvtRatio)<=1:
-            # list containing items not in training set
-            notTrainVal_list = [item for item in notTrain_list if item not in val_list]
-            test_list = random.sample(notTrainVal_list, int(tvtRatio[2]*len(filename_list)))
+        class_files[klass] = filename_list
+
+    #    Drop duplicate files
+    # -------------------------------------------------------------------- #
+    if excludeDuplicates:
+        duplicate_groups = pv.core.find_duplicate_files([item for klass in classes for item in class_files[klass]])
+        for klass in classes:
+            class_files[klass] = pv.core.exclude_duplicate_files(class_files[klass], duplicate_groups)
+        return_dict['duplicates'] = duplicate_groups
+        if verbose>0:
+            print('Found {} groups of duplicate files. Excluding {} redundant copies.\n'.format(len(duplicate_groups), sum(len(group)-1 for group in duplicate_groups)))
+
+    if verbose>1:
+        print('Found', len(classes), 'immediate directories in given source path. Interpreting directory names as class names. Anticipated split per class is shown below.\n')
+    # create an output table
+    if verbose>0:
+        print(''.ljust(80,'-'))
+        print('CLASS'.ljust(30)+' | '+'TRAIN'.rjust(6)+' | '+'VAL'.rjust(6)+' | '+'TEST'.rjust(6)+' | '+'SAMPLE'.rjust(6)+' | '+'TOTAL'.rjust(6))
+        print(''.ljust(80,'-'))
+
+    #    Return the output table (heading only)
+    # -------------------------------------------------------------------- #
+    return_dict['Table heading'] = 'CLASS'.ljust(30)+'\t'+'TRAIN'.rjust(6)+'\t'+'VAL'.rjust(6)+'\t'+'TEST'.rjust(6)+'\t'+'SAMPLE'.rjust(6)+'\t'+'TOTAL'.rjust(6)
+    # create a list to hold each row of the table
+    output_table = []
+    # (source, destination) of every file to be moved/copied
+    file_pairs = []
+
+    #    Hash-based or group-aware split of all classes at once
+    # -------------------------------------------------------------------- #
+    if hashSplit:
+        thresholds = _hash_split_thresholds(tvtRatio)
+        root_prefix = _hash_split_root(srcPath)
+        class_splits = {klass: np.array([split for _, split in _iter_hash_split(class_files[klass], thresholds, seed, root_prefix, groupLevel)], dtype=np.int8)
+            for klass in classes}
+    elif groupLevel is not None:
+        class_sizes = [len(class_files[klass]) for klass in classes]
+        all_splits = stratified_split(np.repeat(np.arange(len(classes)), class_sizes), tvtRatio, rng,
+            groups=path_group_keys([item for klass in classes for item in class_files[klass]], groupLevel))
+        class_splits = dict(zip(classes, np.split(all_splits, np.cumsum(class_sizes)[:-1]) if classes else []))
+
+    # Loop through each class/subfolder
+    # ----------------------------------
+    for klass in classes:
+
+        filename_list = class_files[klass]
+
+        # build the training, validation and test set lists (filenames only) in a given class
+        if groupLevel is None and not hashSplit:
+            train_list, val_list, test_list = [_take_items(filename_list, indices) for indices in _split_indices(len(filename_list), tvtRatio, rng)]
         else:
-            # the third parameter in the ratio list will not be used. All the remaining files are assigned to test set.
-            test_list = [item for item in notTrain_list if item not in val_list]
+            train_list, val_list, test_list = [_take_items(filename_list, np.flatnonzero(class_splits[klass] == split_id)) for split_id in range(3)]
 
         # calculate length of sampled data
         len_sampled_list = len(train_list) + len(val_list) + len(test_list)
@@ -539,26 +765,35 @@ def dataset_splitting_subFolderIsClass(
             os.mkdir(Path(dstPath, dstSubFolderName, 'val', klass))
             os.mkdir(Path(dstPath, dstSubFolderName, 'test', klass))
 
-            # Now move/copy the files from the source folder (class subfolders) to the destination (class subfolder) within either the T, V or T folder.
-            for item in train_list:
-                if moveSrcFiles:
-                    shutil.move(item, Path(dstPath, dstSubFolderName, 'train', klass))
-                else:
-                    shutil.copy(item, Path(dstPath, dstSubFolderName, 'train', klass))
-            for item in val_list:
-                if moveSrcFiles:
-                    shutil.move(item, Path(dstPath, dstSubFolderName, 'val', klass))
-                else:
-                    shutil.copy(item, Path(dstPath, dstSubFolderName, 'val', klass))
-            for item in test_list:
-                if moveSrcFiles:
-                    shutil.move(item, Path(dstPath, dstSubFolderName, 'test', klass))
-                else:
-                    shutil.copy(item, Path(dstPath, dstSubFolderName, 'test', klass))
-        
+            # Now collect where the files go from the source folder (class subfolders) to the destination (class subfolder) within either the T, V or T folder. They are all moved/copied at once below.
+            for split, split_list in zip(['train', 'val', 'test'], [train_list, val_list, test_list]):
+                for item in split_list:
+                    file_pairs.append((item, Path(dstPath, dstSubFolderName, split, klass, Path(item).name)))
+
+    # ------------------------------------
+    # Copy/move files to TVT directories
+    # ------------------------------------
+    if not softMode:
+        if strategy is None:
+            strategy = 'move' if moveSrcFiles else 'copy'
+        failed = pv.core.materialise_files(file_pairs, strategy=strategy, workers=workers)
+        if failed is None:
+            return None
+        return_dict['Failed files'] = failed
+        for src, dst, error in failed:
+            print('ERROR: Could not', strategy, src, 'to', dst, '-', error)
+
     if verbose>0 and not softMode:
         print('\nSuccessfully completed moving/copying files.')
 
+    #    Save the split manifest
+    # -------------------------------------------------------------------- #
+    if manifestPath is not None:
+        return_dict['manifest hash'] = write_split_manifest(manifestPath, {klass: return_dict[klass] for klass in classes},
+            {'srcPath': str(srcPath), 'tvtRatio': tvtRatio, 'seed': seed, 'fileExtensions': fileExtensions})
+        if verbose>0:
+            print('Saved the split manifest to', manifestPath)
+
     #    Return the output table data
     # -------------------------------------------------------------------- #
     
@@ -574,7 +809,9 @@ def dataset_splitting_subFolderIsClass(
 def paths_to_tvt(
     imgPaths:list, className:str, dstPath:str='', clearClassDirs:bool=False,
     tvtRatio:list=[7,2,1], seed:int=1000, 
-    softMode:bool=True, verbose:int=0
+    softMode:bool=True, verbose:int=0,
+    strategy:str='copy2', workers:int=8,
+    manifestPath=None, groupLevel:int=None, hashSplit:bool=False
     ):
 
     """
@@ -592,10 +829,20 @@ def paths_to_tvt(
 
       tvtRatio (float, list of floats or ints, optional): Splits the data in the provided ratios. Ratios such as 0.7, 12, [0.8], [0.8, 0.2], [0.8, 0.1, 0.1], [6, 3], [500, 100, 200] and so on... are all valid. In most cases, the function will correctly interpret the ratios and normalize them. Ratios such as [80, 10, 5, 5] are invalid (4 elements) and will cause the function to quit. It is possible to subsample the source files, i.e. utilize only a fraction of the entire dataset by providing 3 ratios whose sum is less than or equal to 1. 
 
-      seed (number, optional): Seed used for random sampling for images. Use the same number if it is intended to get the same TVT samples repeatedly. Default is None, which means that the sampling will be non-repeatable because random function by default uses the system time as seed.
+      seed (number, optional): Seed used for random sampling for images. Use the same number if it is intended to get the same TVT samples repeatedly. Default is 1000, so the same images give the same TVT samples on every call. Pass None for a non-repeatable sampling, in which case the random generator is seeded with fresh entropy from the operating system.
 
       softMode (boolean, optional): If this feature is turned on (True), then the function will return the usual information and not actually create/delete directories nor copy/move any files. Default is True.
 
+      strategy (string, optional): How the files are placed in the destination: 'copy', 'copy2', 'move', 'hardlink', 'symlink' or 'reflink' (see pvnrt.core.materialise_files). Default is 'copy2'.
+
+      workers (int, optional): Number of threads used to copy/move/link the files. Default is 8.
+
+      groupLevel (int, optional): If passed, images that share the path part at this level are kept together in the same split, e.g. -2 keeps all images of a parent folder (the folder name that is put in front of the destination file names) in one split. See stratified_split and path_group_keys. Default is None.
+
+      hashSplit (boolean, optional): If True, each image is assigned to a split from a stable hash of the seed and its path as given (or its group key, if groupLevel is passed), see iter_hash_split. An image then keeps its split when images are added later. Default is False.
+
+      manifestPath (string or Path, optional): If passed, the split is also saved to this manifest file with className as its only class (see write_split_manifest). Its content hash is returned under the key 'Manifest hash'. Default is None.
+
     RETURNS:
     TODO: add return values
 
@@ -604,6 +851,11 @@ def paths_to_tvt(
 
     """
 
+    # an invalid strategy would only be noticed when the files are placed, after the class folders have been cleared
+    if strategy not in pv.core.MATERIALISE_STRATEGIES:
+        print('ERROR: Invalid strategy specified. Function exiting.')
+        return None
+
     # create the return dictionary
     return_dict = {}
     return_dict['Class name'] = className
@@ -667,49 +919,8 @@ def paths_to_tvt(
     # -------------------------------
     # Taking care of the ratio input
     # -------------------------------
-    
-    # Convert ratio to a list if a single value is passed
-    if type(tvtRatio) is not list:
-        tvtRatio = [tvtRatio]
-    # makes sure the ratios passed are floating point numbers
-    tvtRatio = [float(item) for item in tvtRatio]
-    
-    # A user can pass 1, 2, 3 or more (erroneously) values in the ratio. Process accordingly.
-    if len(tvtRatio)==3:
-        if sum(tvtRatio)>=1:
-            # Normalize them so that their sum is 1.
-            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio] # sum = 1.0
-            if verbose>0:
-                print('3 ratios provided, interpreted as', tvtRatio)
-        else:
-            # IMPORTANT: if sum of the ratios is less than 1, then and only then, interpret them as subsampling (not utilizing all images). In this case tvtRatio should be left unchanged.
-            if verbose>0:
-                print('3 ratios provided, interpreted as', tvtRatio, 'do not add up to 1. Assuming subsampling (not utilizing all images in the source) is intended, only the displayed fraction of images will be randomly sampled.')
-
-    elif len(tvtRatio)==2:
-        # this can mean two things - user does not want a test set unless the sum of the ratios is less than one. If the sum is more than 1, then normalize the set. For example, if ratio is 8:5, normalize it to [8/13:5/13] and assume that they don't want a test set.
-        if sum(tvtRatio)>=1:
-            # No test set will be generated
-            tvtRatio = [item/sum(tvtRatio) for item in tvtRatio]
-            if verbose>0:
-                print('Two ratios provided, with sum greater than or equal to 1. Assuming no test set is required. Will create training and validation set in the given ratio, normalized to', tvtRatio)
-        else:
-            if verbose>0:
-                print('Two ratios provided, with sum less than 1. Test set will also be created with the remainder items.')
-    elif len(tvtRatio)==1:
-        # this definitely means no test set is desired. If the element is less than 1, then it is assumed that a validation set is desired, else it is assumed that it is not.
-        if tvtRatio[0]>=1:
-            # set the list to [1, 0] so that no validation or test data is created.
-            tvtRatio = [1, 0]
-            if verbose>0:
-                print('Only one ratio, greater than or equal to 1, provided. Weird input, but okay! No validation or training set will be generated.')
-        else:
-            # create a validation ratio (remainder), our code needs a second ratio
-            tvtRatio = [tvtRatio[0], 1-tvtRatio[0]]
-            if verbose>0:
-                print('Only one ratio, less than 1, provided. Validation set will be generated from the remainder items.')
-    else:
-        print('Invalid validation ratios. Function exiting.')
+    tvtRatio = _interpret_tvt_ratio(tvtRatio, verbose)
+    if tvtRatio is None:
         return None
 
     #    Return the interpreted ratio
@@ -719,29 +930,23 @@ def paths_to_tvt(
     # ------------------------
     # Setting seed
     # ------------------------
-    if seed:
-        random.seed(seed)
+    # a generator of its own, so that the global random state used by other code is left alone
+    rng = np.random.default_rng(seed)
 
     # -----------------------------------------
     # Split the files into tvt folders
     # -----------------------------------------
 
-    # build a training set list (filenames only) in a given class
-    train_list = random.sample(imgPaths, int(tvtRatio[0]*len(imgPaths)))
-    # list containing items not in training set
-    notTrain_list = [item for item in imgPaths if item not in train_list]
-    # build a validation set list (filenames only) in a given class
-    val_list = random.sample(notTrain_list, int(tvtRatio[1]*len(imgPaths)))
-
-    # build a testing set list (filenames only) in a given class
-    #   IMPORTANT: Two cases arise here
-    if len(tvtRatio)==3 and sum(tvtRatio)<=1:
-        # list containing items not in training set
-        notTrainVal_list = [item for item in notTrain_list if item not in val_list]
-        test_list = random.sample(notTrainVal_list, int(tvtRatio[2]*len(imgPaths)))
+    # build the training, validation and test set lists (filenames only) in a given class
+    if hashSplit:
+        # the ratio has been interpreted above already, so the thresholds are passed directly
+        splits = np.array([split for _, split in _iter_hash_split(imgPaths, _hash_split_thresholds(tvtRatio), seed, '', groupLevel)], dtype=np.int8)
+        train_list, val_list, test_list = [_take_items(imgPaths, np.flatnonzero(splits == split_id)) for split_id in range(3)]
+    elif groupLevel is None:
+        train_list, val_list, test_list = [_take_items(imgPaths, indices) for indices in _split_indices(len(imgPaths), tvtRatio, rng)]
     else:
-        # the third parameter in the ratio list will not be used. All the remaining files are assigned to test set.
-        test_list = [item for item in notTrain_list if item not in val_list]
+        splits = stratified_split(np.zeros(len(imgPaths), dtype=np.int8), tvtRatio, rng, groups=path_group_keys(imgPaths, groupLevel))
+        train_list, val_list, test_list = [_take_items(imgPaths, np.flatnonzero(splits == split_id)) for split_id in range(3)]
 
     # -------------------------------------
     # Add split paths to the return dict
@@ -753,6 +958,9 @@ def paths_to_tvt(
     return_dict['Input number'] = len(imgPaths)
     return_dict['Sampled paths list'] = [train_list, val_list, test_list]
 
+    if manifestPath is not None:
+        return_dict['Manifest hash'] = write_split_manifest(manifestPath, {className: [train_list, val_list, test_list]}, {'tvtRatio': tvtRatio, 'seed': seed})
+
     # ------------------------------------
     # Copy/move files to TVT directories
     # ------------------------------------
@@ -760,21 +968,17 @@ def paths_to_tvt(
     if not softMode:
         # Move/copy the files from the source folder (class subfolders) to the destination (class subfolder) within either the T, V or T folder.
         # Note: If the file is not found in the directory, that means it was wrongly present in the excel file (the reverse can also be true, a file may exist in the directory but not in the excel file). In this case, the file will be skipped and log an error.
-        for item in train_list:
-            if Path(item).is_file():
-                shutil.copy2(Path(item), Path(dstPath, 'train', className, Path(item).parents[0].name+' '+Path(item).name))
-            else:
-                pv.core.basic_logger('File '+str(item)+' not found. Skipping.', logLevel='warning', logFileName='log.txt', logPath=dstPath, printLog=True)
-        for item in val_list:
-            if Path(item).is_file():
-                shutil.copy2(Path(item), Path(dstPath, 'val', className, Path(item).parents[0].name+' '+Path(item).name))
-            else:
+        file_pairs = [(item, Path(dstPath, split, className, Path(item).parents[0].name+' '+Path(item).name))
+            for split, split_list in zip(['train', 'val', 'test'], [train_list, val_list, test_list]) for item in split_list]
+        failed = pv.core.materialise_files(file_pairs, strategy=strategy, workers=workers)
+        if failed is None:
+            return None
+        return_dict['Failed files'] = failed
+        for item, _, error in failed:
+            if isinstance(error, FileNotFoundError) and not Path(item).is_file():
                 pv.core.basic_logger('File '+str(item)+' not found. Skipping.', logLevel='warning', logFileName='log.txt', logPath=dstPath, printLog=True)
-        for item in test_list:
-            if Path(item).is_file():
-                shutil.copy2(Path(item), Path(dstPath, 'test', className, Path(item).parents[0].name+' '+Path(item).name))
             else:
-                pv.core.basic_logger('File '+str(item)+' not found. Skipping.', logLevel='warning', logFileName='log.txt', logPath=dstPath, printLog=True)
+                pv.core.basic_logger('File '+str(item)+' could not be placed ('+str(error)+'). Skipping.', logLevel='warning', logFileName='log.txt', logPath=dstPath, printLog=True)
         
         #    Logging
         # -------------------------------------------------------------------- #
@@ -786,6 +990,108 @@ def paths_to_tvt(
 
 
 
+#    SPLIT MANIFESTS
+# ============================================================================ #
+
+SPLIT_MANIFEST_VERSION = 1
+SPLIT_NAMES = ['train', 'val', 'test']
+
+def _split_manifest_hash(arrays:dict) -> str:
+    """
+    sha256 of the arrays of a split manifest (names, dtypes, shapes and data, in name order).
+    """
+    hasher = hashlib.sha256()
+    for name in sorted(arrays):
+        array = np.ascontiguousarray(arrays[name])
+        hasher.update((name + '|' + array.dtype.str + '|' + str(array.shape) + '|').encode('utf-8'))
+        hasher.update(array.tobytes())
+    return hasher.hexdigest()
+
+def write_split_manifest(manifestPath, splits:dict, metadata:dict=None) -> str:
+    """
+    Saves a train/val/test split to a compact, versioned manifest (a NumPy .npz file), so that it can be loaded again with load_split_manifest without scanning the source folders again.
+
+    The manifest holds one row per file with columns path_ids, class_ids and split_ids (0 train, 1 val, 2 test, as int8), a table of the paths (all paths as one NUL separated UTF-8 buffer), the class names, metadata (e.g. the ratio and seed) as JSON, the format version, and a sha256 hash of all of it. It is written to a temporary file first and then renamed.
+
+    ARGUMENTS:
+      manifestPath (str or Path): The file to write (conventionally with the .npz extension).
+
+      splits (dict): Class name -> [train list, val list, test list], i.e. the per-class entries returned by the splitters.
+
+      metadata (dict, optional): JSON serialisable information to store along, e.g. {'tvtRatio': [0.7, 0.2, 0.1], 'seed': 42}. Default is None.
+
+    RETURNS:
+    The content hash of the manifest.
+
+    """
+    classes = list(splits)
+    paths, class_ids, split_ids = [], [], []
+    for class_id, klass in enumerate(classes):
+        for split_id, split_list in enumerate(splits[klass]):
+            paths += list(split_list.strings()) if isinstance(split_list, pv.core.PathTable) else [str(item) for item in split_list]
+            class_ids.append(np.full(len(split_list), class_id, dtype=np.int32))
+            split_ids.append(np.full(len(split_list), split_id, dtype=np.int8))
+
+    arrays = {
+        'format_version': np.array(SPLIT_MANIFEST_VERSION, dtype=np.int32),
+        'path_ids': np.arange(len(paths), dtype=np.int64),
+        'class_ids': np.concatenate(class_ids) if class_ids else np.zeros(0, dtype=np.int32),
+        'split_ids': np.concatenate(split_ids) if split_ids else np.zeros(0, dtype=np.int8),
+        # paths can't contain NUL characters, so it separates them
+        'path_bytes': np.frombuffer('\0'.join(paths).encode('utf-8', 'surrogateescape'), dtype=np.uint8),
+        'classes': np.array(classes, dtype=str),
+        'metadata': np.array(json.dumps(metadata or {}, default=str)),
+    }
+    content_hash = _split_manifest_hash(arrays)
+
+    temp_path = Path(str(manifestPath) + '.tmp')
+    with open(temp_path, 'wb') as fyle:
+        np.savez(fyle, content_hash=np.array(content_hash), **arrays)
+    os.replace(temp_path, manifestPath)
+    return content_hash
+
+def load_split_manifest(manifestPath, asTable:bool=False, verify:bool=True) -> dict:
+    """
+    Loads a split saved by write_split_manifest (or by the manifestPath option of the splitters), in one file read and without touching the source folders.
+
+    ARGUMENTS:
+      manifestPath (str or Path): The manifest file.
+
+      asTable (boolean, optional): Return the split lists as pvnrt.core.PathTable objects instead of lists of Paths, which is faster and much smaller for millions of files. Default is False.
+
+      verify (boolean, optional): Check the content hash and raise a ValueError if the manifest has been changed or damaged. Default is True.
+
+    RETURNS:
+    A dict in the same form as the one returned by dataset_splitting_subFolderIsClass: 'classes' (list of class names), one [train, val, test] entry per class, plus 'metadata', 'hash' and 'format_version'.
+
+    """
+    with np.load(manifestPath, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    content_hash = str(arrays.pop('content_hash'))
+    if int(arrays['format_version']) > SPLIT_MANIFEST_VERSION:
+        raise ValueError('Split manifest ' + str(manifestPath) + ' has format version ' + str(int(arrays['format_version'])) + ', newer than the supported version ' + str(SPLIT_MANIFEST_VERSION))
+    if verify and _split_manifest_hash(arrays) != content_hash:
+        raise ValueError('Split manifest ' + str(manifestPath) + ' does not match its content hash')
+
+    paths = arrays['path_bytes'].tobytes().decode('utf-8', 'surrogateescape').split('\0') if len(arrays['path_ids']) else []
+    classes = [str(item) for item in arrays['classes']]
+
+    return_dict = {'classes': classes, 'metadata': json.loads(str(arrays['metadata'])), 'hash': content_hash, 'format_version': int(arrays['format_version'])}
+    # a stable sort by (class, split) keeps the order of the files within each split
+    order = np.lexsort((arrays['split_ids'], arrays['class_ids']))
+    ids = arrays['path_ids'][order]
+    bounds = np.searchsorted(arrays['class_ids'][order] * len(SPLIT_NAMES) + arrays['split_ids'][order], np.arange(len(classes) * len(SPLIT_NAMES) + 1))
+    for class_id, klass in enumerate(classes):
+        split_lists = []
+        for split_id in range(len(SPLIT_NAMES)):
+            start, stop = bounds[class_id*len(SPLIT_NAMES) + split_id], bounds[class_id*len(SPLIT_NAMES) + split_id + 1]
+            split_paths = [paths[i] for i in ids[start:stop]]
+            split_lists.append(pv.core.PathTable(split_paths) if asTable else [Path(item) for item in split_paths])
+        return_dict[klass] = split_lists
+    return return_dict
+
+
+
 # ============================================================================ #
 #    MODELS
 # ============================================================================ #